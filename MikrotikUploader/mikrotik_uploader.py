@@ -19,14 +19,19 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import json
 import os
 import threading
-import queue
+from collections import deque  # Для очереди журнала GUI (потокобезопасные append/popleft)
 import codecs
 import glob
+import hashlib  # Для отпечатков содержимого скриптов (инкрементальная загрузка)
 from datetime import datetime
 import socket   # Для TCP подключения к API
+import select   # Для проверки непрочитанных данных в сокете
 import time     # Для пауз между операциями
 import sys      # Для работы с аргументами командной строки
 import re       # Для регулярных выражений (очистка символов)
+import asyncio  # Для асинхронного клиента API (много роутеров в одном цикле событий)
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor  # Для параллельной загрузки TEMP частей
 
 def find_codenosos_dir():
     """
@@ -58,6 +63,583 @@ def find_codenosos_dir():
     
     return None
 
+def encode_length(length):
+    """
+    Кодирование длины слова по протоколу API Mikrotik.
+    
+    Формат заголовка длины (старшие биты первого байта задают размер):
+    - < 0x80        : 1 байт  0xxxxxxx
+    - < 0x4000      : 2 байта 10xxxxxx xxxxxxxx
+    - < 0x200000    : 3 байта 110xxxxx + 2 байта
+    - < 0x10000000  : 4 байта 1110xxxx + 3 байта
+    - иначе         : 5 байт  0xF0 + 4 байта длины
+    
+    Args:
+        length (int): Длина слова в байтах
+        
+    Returns:
+        bytes: Заголовок длины (1-5 байт)
+    """
+    if length < 0x80:
+        return length.to_bytes(1, byteorder='big')
+    if length < 0x4000:
+        return (length | 0x8000).to_bytes(2, byteorder='big')
+    if length < 0x200000:
+        return (length | 0xC00000).to_bytes(3, byteorder='big')
+    if length < 0x10000000:
+        return (length | 0xE0000000).to_bytes(4, byteorder='big')
+    return b'\xF0' + length.to_bytes(4, byteorder='big')
+
+def length_prefix_size(first_byte):
+    """
+    Определение размера заголовка длины по его первому байту.
+    
+    Args:
+        first_byte (int): Первый байт заголовка длины
+        
+    Returns:
+        int: Полный размер заголовка в байтах (1-5)
+        
+    Raises:
+        ValueError: Если первый байт является управляющим (0xF8 и выше)
+    """
+    if first_byte < 0x80:
+        return 1
+    if first_byte < 0xC0:
+        return 2
+    if first_byte < 0xE0:
+        return 3
+    if first_byte < 0xF0:
+        return 4
+    if first_byte == 0xF0:
+        return 5
+    raise ValueError(f"Управляющий байт в заголовке длины: 0x{first_byte:02X}")
+
+def decode_length(prefix):
+    """
+    Декодирование заголовка длины, прочитанного целиком.
+    
+    Args:
+        prefix (bytes|memoryview): Заголовок длины (1-5 байт)
+        
+    Returns:
+        int: Длина слова в байтах
+    """
+    size = len(prefix)
+    if size == 5:
+        return int.from_bytes(prefix[1:], byteorder='big')
+    # На каждый байт заголовка приходится 7 бит длины (остальные - маркер размера)
+    return int.from_bytes(prefix, byteorder='big') & ((1 << (7 * size)) - 1)
+
+def encode_word(word):
+    """
+    Кодирование слова API в байты.
+    
+    - Используется Windows-1251 для поддержки русских символов в RouterOS
+    - При ошибке кодирования используется UTF-8 как fallback
+    - Байты передаются как есть
+    
+    Args:
+        word (str|bytes): Слово для отправки
+        
+    Returns:
+        bytes: Закодированное слово (без заголовка длины)
+    """
+    if isinstance(word, bytes):
+        # Если данные уже в байтах - используем как есть
+        return word
+    # Кодируем строку в Windows-1251 для поддержки русских символов в RouterOS
+    # RouterOS поддерживает кодировку Windows-1251 (CP1251)
+    try:
+        return word.encode("windows-1251", errors="replace")
+    except UnicodeEncodeError:
+        # Если не удается закодировать в Windows-1251, используем UTF-8 как fallback
+        return word.encode("utf-8", errors="replace")
+
+def encode_sentence(words):
+    """
+    Сборка предложения API в один заранее выделенный буфер.
+    
+    Каждое слово записывается как заголовок длины + данные, в конце
+    добавляется пустое слово (нулевой байт) - маркер конца предложения.
+    Готовый буфер отправляется одним sendall.
+    
+    Args:
+        words (list): Слова предложения (str или bytes)
+        
+    Returns:
+        bytearray: Полностью сформированное предложение
+    """
+    encoded = [encode_word(word) for word in words]
+    prefixes = [encode_length(len(data)) for data in encoded]
+    
+    # Один байт в конце - пустое слово (уже равен нулю после выделения)
+    total = sum(map(len, encoded)) + sum(map(len, prefixes)) + 1
+    frame = bytearray(total)
+    
+    pos = 0
+    for prefix, data in zip(prefixes, encoded):
+        frame[pos:pos + len(prefix)] = prefix
+        pos += len(prefix)
+        frame[pos:pos + len(data)] = data
+        pos += len(data)
+    
+    return frame
+
+# Максимальный размер части большого скрипта в байтах: слово "=source=<часть>"
+# должно уместиться в 2-байтовый заголовок длины (до 0x3FFF байт)
+MAX_PART_BYTES = 0x3FFF - len('=source=')
+
+def normalize_newlines(content):
+    """Приведение переводов строк к \n (так скрипт хранится на роутере)."""
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
+def encoded_size(content):
+    """Размер скрипта в байтах так, как он уходит на роутер (см. encode_word)."""
+    return len(encode_word(normalize_newlines(content)))
+
+def _split_long_line(line, max_bytes):
+    """
+    Разбиение строки длиннее max_bytes на куски не больше max_bytes.
+    
+    Место разреза ищется бинарным поиском по закодированному размеру и
+    сдвигается назад к последнему пробелу, но не режет escape-
+    последовательности (\", \\, \XX): при обратной косой перед разрезом
+    он сдвигается назад на один символ, а если и это не помогает -
+    остается жестким разрезом по размеру.
+    """
+    pieces = []
+    start = 0
+    while len(encode_word(line[start:])) > max_bytes:
+        # Самый длинный префикс, умещающийся в max_bytes
+        low, high = start + 1, len(line)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if len(encode_word(line[start:middle])) <= max_bytes:
+                low = middle
+            else:
+                high = middle - 1
+        cut = low
+        
+        # Предпочитаем разрез после пробела во второй половине куска
+        space = line.rfind(' ', start + (cut - start) // 2, cut)
+        if space != -1:
+            cut = space + 1
+        
+        # Не отделяем обратную косую от экранируемых ей символов: сдвиг
+        # назад не больше чем на один символ, иначе (длинные серии \\) -
+        # жесткий разрез, чтобы куски не мельчали
+        if cut - start > 2 and '\\' in line[cut - 2:cut]:
+            if cut - start > 3 and '\\' not in line[cut - 3:cut - 1]:
+                cut -= 1
+            else:
+                cut = low
+        
+        pieces.append(line[start:cut])
+        start = cut
+    pieces.append(line[start:])
+    return pieces
+
+def plan_script_chunks(content, max_bytes=MAX_PART_BYTES):
+    """
+    Разбиение большого скрипта на части по точному размеру в байтах.
+    
+    Алгоритм:
+    1. Переводы строк нормализуются, размер каждой строки считается
+       по закодированным байтам (windows-1251, как в encode_word)
+    2. Строки целиком упаковываются в часть, пока она не превысит
+       max_bytes - разрезы приходятся на границы строк, поэтому части
+       не обрывают escape-последовательности и продолжения строк (\)
+    3. Строка длиннее max_bytes режется отдельно (_split_long_line)
+    4. Самопроверка: объединение частей должно побайтно совпасть
+       с исходным содержимым
+    
+    Args:
+        content (str): Содержимое скрипта
+        max_bytes (int): Максимальный размер части в байтах
+        
+    Returns:
+        list: Части скрипта (str) в порядке объединения
+        
+    Raises:
+        ValueError: Если объединение частей не совпало с исходным текстом
+    """
+    content = normalize_newlines(content)
+    parts = []
+    current = []
+    current_size = 0
+    
+    for line in content.splitlines(keepends=True):
+        line_size = len(encode_word(line))
+        if current and current_size + line_size > max_bytes:
+            parts.append(''.join(current))
+            current = []
+            current_size = 0
+        if line_size > max_bytes:
+            *complete, line = _split_long_line(line, max_bytes)
+            parts.extend(complete)
+            line_size = len(encode_word(line))
+        current.append(line)
+        current_size += line_size
+    if current:
+        parts.append(''.join(current))
+    
+    # Самопроверка: части без потерь складываются в исходный скрипт
+    if (''.join(parts) != content or
+            b''.join(encode_word(part) for part in parts) != encode_word(content) or
+            any(len(encode_word(part)) > max_bytes for part in parts)):
+        raise ValueError("План разбиения скрипта не прошел самопроверку")
+    return parts
+
+FINGERPRINT_PREFIX = "sha256:"  # Префикс отпечатка в комментарии скрипта на роутере
+
+def script_fingerprint(content):
+    """
+    Отпечаток содержимого скрипта для инкрементальной загрузки.
+    
+    Считается по тем же байтам, что уходят на роутер: переводы строк
+    нормализуются к \n, текст кодируется через encode_word. Отпечаток
+    записывается в comment скрипта при загрузке и сравнивается с
+    локальным файлом при следующей загрузке.
+    
+    Args:
+        content (str): Содержимое скрипта
+        
+    Returns:
+        str: Строка вида "sha256:<16 hex символов>"
+    """
+    content = normalize_newlines(content)
+    digest = hashlib.sha256(encode_word(content)).hexdigest()
+    return FINGERPRINT_PREFIX + digest[:16]
+
+class RouterRecord:
+    """
+    Компактная запись объекта RouterOS, разобранная из предложения !re.
+    
+    Подклассы задают PROPERTIES (имя свойства API -> имя атрибута) и
+    __slots__ с теми же атрибутами: записи не держат словарь на каждую
+    строку листинга. Каждое слово ответа делится один раз через
+    partition('='), свойства вне PROPERTIES (или вне запрошенного
+    proplist) пропускаются, отсутствующие получают значения из DEFAULTS.
+    """
+    
+    __slots__ = ()
+    PROPERTIES = {}
+    DEFAULTS = {}
+    
+    def __init__(self, **values):
+        for attribute in self.PROPERTIES.values():
+            setattr(self, attribute, values.get(attribute, self.DEFAULTS.get(attribute, '')))
+    
+    @classmethod
+    def proplist(cls, properties=None):
+        """Слово =.proplist= для запроса только нужных свойств."""
+        return '=.proplist=' + ','.join(properties or cls.PROPERTIES)
+    
+    @classmethod
+    def from_sentence(cls, sentence):
+        """
+        Разбор предложения !re в запись.
+        
+        Args:
+            sentence (list): Слова ответа, начиная с '!re'
+        
+        Returns:
+            RouterRecord: Запись со значениями свойств
+        """
+        record = cls()
+        properties = cls.PROPERTIES
+        for word in sentence:
+            if word[:1] != '=':
+                continue
+            key, _, value = word[1:].partition('=')
+            attribute = properties.get(key)
+            if attribute is not None:
+                setattr(record, attribute, value)
+        return record
+    
+    def __repr__(self):
+        values = ', '.join(f"{attribute}={getattr(self, attribute)!r}"
+                           for attribute in self.PROPERTIES.values())
+        return f"{type(self).__name__}({values})"
+
+class ScriptRecord(RouterRecord):
+    """Скрипт из /system/script."""
+    
+    __slots__ = ('id', 'name', 'owner', 'run_count', 'comment')
+    PROPERTIES = {'.id': 'id', 'name': 'name', 'owner': 'owner',
+                  'run-count': 'run_count', 'comment': 'comment'}
+    DEFAULTS = {'run_count': '0'}
+
+class SchedulerRecord(RouterRecord):
+    """Планировщик из /system/scheduler."""
+    
+    __slots__ = ('id', 'name', 'disabled', 'next_run')
+    PROPERTIES = {'.id': 'id', 'name': 'name', 'disabled': 'disabled',
+                  'next-run': 'next_run'}
+    DEFAULTS = {'disabled': 'true'}
+    
+    @property
+    def enabled(self):
+        return self.disabled == 'false'
+
+class JobRecord(RouterRecord):
+    """Задача из /system/script/job."""
+    
+    __slots__ = ('id', 'script', 'type', 'status', 'started')
+    PROPERTIES = {'.id': 'id', 'script': 'script', 'type': 'type',
+                  'status': 'status', 'started': 'started'}
+    DEFAULTS = {'status': 'running'}
+    
+    @property
+    def finished(self):
+        return self.status != 'running'
+
+class RouterQuery:
+    """
+    Построитель слов запроса для print - фильтрация на стороне роутера.
+    
+    Условия записываются в обратной польской записи API RouterOS: каждое
+    слово ?... кладет результат на стек, ?#| ?#& ?#! объединяют вершину
+    стека. Условия, добавленные подряд, роутер объединяет по И.
+    Методы возвращают self, поэтому вызовы можно сцеплять:
+        
+        RouterQuery().has('status').not_equal('status', 'running')
+    """
+    
+    def __init__(self):
+        self.words = []
+    
+    def __iter__(self):
+        return iter(self.words)
+    
+    def equal(self, key, value):
+        """Свойство равно значению."""
+        self.words.append(f'?{key}={value}')
+        return self
+    
+    def not_equal(self, key, value):
+        """Свойство не равно значению (или отсутствует)."""
+        self.words += [f'?{key}={value}', '?#!']
+        return self
+    
+    def has(self, key):
+        """Свойство присутствует."""
+        self.words.append(f'?{key}')
+        return self
+    
+    def lacks(self, key):
+        """Свойство отсутствует."""
+        self.words.append(f'?-{key}')
+        return self
+    
+    def any_of(self, key, values):
+        """Свойство равно любому из значений (?k=a ?k=b ?#| ...)."""
+        values = list(values)
+        if not values:
+            raise ValueError(f"Пустой список значений для ?{key}")
+        for index, value in enumerate(values):
+            self.words.append(f'?{key}={value}')
+            if index:
+                self.words.append('?#|')  # Объединение с предыдущими условиями
+        return self
+    
+    def prefix(self, key, prefix):
+        """
+        Свойство начинается с prefix.
+        
+        API не умеет сравнение по шаблону, поэтому префикс задается
+        строковым диапазоном: key == prefix или prefix < key < верхняя
+        граница (prefix с увеличенным последним символом).
+        
+        Диапазон совпадает с префиксом только при побайтовом сравнении
+        ASCII строк. Для пустого префикса и префикса не из ASCII фильтр
+        не добавляется - вызывающий код все равно проверяет startswith
+        на своей стороне.
+        """
+        if not prefix or not prefix.isascii() or prefix[-1] == '\x7f':
+            return self
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        self.words += [f'?{key}={prefix}', f'?>{key}={prefix}', '?#|',
+                       f'?<{key}={upper}', '?#&']
+        return self
+
+class AdaptivePacer:
+    """
+    Адаптивные паузы по измеренной отзывчивости роутера.
+    
+    Каждая команда дает замер "отправка → !done". По замерам считаются
+    сглаженное время ответа и его разброс (как RTO в TCP):
+        srtt   = 7/8 * srtt + 1/8 * sample
+        rttvar = 3/4 * rttvar + 1/4 * |srtt - sample|
+        response_time = srtt + 4 * rttvar
+    
+    Паузы в пути загрузки равны оценке времени ответа, но не больше
+    заданных верхних границ. Пока замеров нет - используются сами границы
+    (прежнее поведение), на быстром роутере паузы сокращаются до
+    миллисекунд.
+    """
+    
+    SCHEDULER_LEAD_MIN = 2  # Минимальный запас запуска шедулера (сек) - граница секунды часов роутера
+    
+    def __init__(self, settle_max=1.0, part_gap_max=0.5, scheduler_lead_max=5):
+        """
+        Args:
+            settle_max (float): Верхняя граница паузы после загрузки скрипта (сек)
+            part_gap_max (float): Верхняя граница паузы между TEMP частями (сек)
+            scheduler_lead_max (int): Верхняя граница запаса времени запуска
+                combine-шедулера относительно часов роутера (сек)
+        """
+        self.settle_max = settle_max
+        self.part_gap_max = part_gap_max
+        self.scheduler_lead_max = scheduler_lead_max
+        self.srtt = None       # Сглаженное время ответа (сек)
+        self.rttvar = 0.0      # Сглаженный разброс времени ответа (сек)
+        self.samples = 0       # Количество замеров
+        
+    def observe(self, seconds):
+        """Учет замера времени ответа роутера (сек)."""
+        if self.srtt is None:
+            self.srtt = seconds
+            self.rttvar = seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+        self.samples += 1
+        
+    def response_time(self):
+        """Оценка времени ответа роутера (None пока нет замеров)."""
+        if self.srtt is None:
+            return None
+        return self.srtt + 4 * self.rttvar
+    
+    def _pause(self, upper_bound):
+        """Пауза по оценке времени ответа, ограниченная сверху."""
+        estimate = self.response_time()
+        if estimate is None:
+            return upper_bound
+        return min(upper_bound, estimate)
+    
+    def settle_delay(self):
+        """Пауза после загрузки скрипта."""
+        return self._pause(self.settle_max)
+    
+    def part_gap(self):
+        """Пауза между загрузкой TEMP частей."""
+        return self._pause(self.part_gap_max)
+    
+    def scheduler_lead(self):
+        """
+        Запас времени (целые секунды) для запуска шедулера в будущем.
+        
+        Нужно успеть создать шедулер до наступления start-time с учетом
+        того, что часы роутера могут быть в конце текущей секунды.
+        """
+        estimate = self.response_time()
+        if estimate is None:
+            return self.scheduler_lead_max
+        lead = int(1 + 3 * estimate) + 1  # Округление вверх с запасом
+        return max(self.SCHEDULER_LEAD_MIN, min(self.scheduler_lead_max, lead))
+
+class DeadlineExceeded(TimeoutError):
+    """Бюджет времени операции исчерпан (с указанием этапа)."""
+    
+    def __init__(self, phase, budget):
+        self.phase = phase
+        self.budget = budget
+        super().__init__(f"превышен бюджет времени {budget:g} сек на этапе «{phase}»")
+
+class OperationCancelled(Exception):
+    """Операция отменена пользователем (кнопка остановки)."""
+    
+    def __init__(self, phase):
+        self.phase = phase
+        super().__init__(f"операция отменена на этапе «{phase}»")
+
+class Deadline:
+    """
+    Общий бюджет времени одной высокоуровневой операции.
+    
+    Вместо фиксированного таймаута сокета на каждый вызов (60 сек на
+    каждый connect/send/recv) операция - загрузка, обновление списков,
+    пакетное удаление - получает один срок, который передается во все
+    сетевые вызовы MikrotikUploader (атрибут deadline):
+    
+    - connect и sendall получают таймаут, равный остатку бюджета
+    - recv и ожидание событий идут срезами по POLL_INTERVAL, между
+      срезами проверяются остаток и событие отмены
+    - паузы между этапами прерываются отменой
+    
+    Так зависший роутер занимает рабочий поток не дольше бюджета, а
+    кнопка остановки срабатывает в пределах POLL_INTERVAL. Текущий этап
+    (phase) попадает в сообщение об ошибке.
+    """
+    
+    POLL_INTERVAL = 0.5  # Наибольший срез ожидания (сек) между проверками отмены
+    
+    def __init__(self, budget, cancel_event=None, phase="операция"):
+        """
+        Args:
+            budget (float): Бюджет времени в секундах
+            cancel_event (threading.Event): Событие отмены (необязательно)
+            phase (str): Начальное название этапа
+        """
+        self.budget = budget
+        self.cancel_event = cancel_event
+        self.current_phase = phase
+        self.expires_at = time.monotonic() + budget
+    
+    def remaining(self):
+        """Остаток бюджета в секундах (не меньше 0)."""
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    def check(self):
+        """
+        Проверка отмены и остатка бюджета.
+        
+        Raises:
+            OperationCancelled: Установлено событие отмены
+            DeadlineExceeded: Бюджет исчерпан
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise OperationCancelled(self.current_phase)
+        if self.expires_at <= time.monotonic():
+            raise DeadlineExceeded(self.current_phase, self.budget)
+    
+    def socket_timeout(self, limit=None):
+        """Таймаут для очередного вызова сокета: остаток бюджета, не больше limit."""
+        self.check()
+        remaining = self.remaining()
+        return min(remaining, limit) if limit is not None else remaining
+    
+    def sleep(self, seconds, strict=True):
+        """
+        Пауза, прерываемая отменой и ограниченная остатком бюджета.
+        
+        Args:
+            seconds (float): Длительность паузы
+            strict (bool): Проверить отмену и бюджет (исключение) -
+                False для пауз после уже завершенной операции
+        """
+        seconds = min(seconds, self.socket_timeout() if strict else self.remaining())
+        if self.cancel_event is not None:
+            self.cancel_event.wait(seconds)
+        else:
+            time.sleep(seconds)
+        if strict:
+            self.check()
+    
+    @contextmanager
+    def phase(self, name):
+        """Контекст этапа операции - его название попадает в ошибки бюджета."""
+        previous = self.current_phase
+        self.current_phase = name
+        try:
+            yield self
+        finally:
+            self.current_phase = previous
+
+
 class MikrotikUploader:
     """
     Класс для загрузки скриптов на Mikrotik через API протокол.
@@ -70,14 +652,27 @@ class MikrotikUploader:
     - Автоматическое объединение частей через scheduler
     - Проверка успешности операций
     
-    Архитектура работы с большими файлами:
+    Большие файлы по умолчанию загружаются одной командой (длина слова
+    кодируется в 3-5 байтах). Разделение на части остается резервным путем.
+    
+    Архитектура работы с большими файлами (режим "split"):
     1. Файл разделяется на части по 15KB
     2. Каждая часть загружается как временный скрипт (script-TEMP1, script-TEMP2...)
     3. Создается combine-скрипт для объединения частей
-    4. Через scheduler запускается combine-скрипт
+    4. Combine-скрипт запускается через /system/script/run (scheduler - резервный путь)
     5. Combine-скрипт создает финальный скрипт и удаляет временные части
     """
     
+    RX_BUFFER_SIZE = 64 * 1024  # Начальный размер буфера приема (байт)
+    LARGE_SCRIPT_THRESHOLD = 15000  # Размер, с которого скрипт считается большим (байт на роутере)
+    PIPELINE_WINDOW = 32            # Максимум команд "в полете" на одном соединении
+    PART_UPLOAD_CONNECTIONS = 4     # Максимум параллельных соединений для TEMP частей
+    PART_UPLOAD_ATTEMPTS = 3        # Попыток загрузки одной TEMP части
+    VERIFY_QUERY_NAMES = 100        # Максимум имен в одном OR-запросе print
+    STAGING_SUFFIX = "-NEW"         # Суффикс новой версии скрипта до замены старой (upload_scripts)
+    SOCKET_TIMEOUT = 60             # Таймаут вызова сокета, если бюджет операции (deadline) не задан
+    SCRIPT_POLICY = '=policy=read,write,policy,test,sensitive,ftp,reboot,password,sniff,romon'
+    
     def __init__(self):
         """
         Инициализация параметров подключения и счетчиков.
@@ -98,39 +693,151 @@ class MikrotikUploader:
         self.uploaded_count = 0               # Количество успешно загруженных скриптов
         self.failed_count = 0                 # Количество неудачных загрузок
         
+        # Режим загрузки больших скриптов:
+        # "direct" - одной командой /system/script/add (многобайтовая длина слова)
+        # "split"  - разделение на TEMP части с объединением на роутере
+        self.large_upload_mode = "direct"
+        
+        # Запуск объединения частей (режим "split"):
+        # "run"       - сразу через /system/script/run (планировщик - при отказе)
+        # "scheduler" - всегда через однократный планировщик
+        self.combine_mode = "run"
+        
+        # Буфер приема ответов роутера (заполняется через recv_into)
+        # Слова и заголовки длины разбираются прямо из memoryview без копирования
+        self.sock = None
+        self._rx_buffer = bytearray(self.RX_BUFFER_SIZE)
+        self._rx_view = memoryview(self._rx_buffer)
+        self._rx_start = 0                    # Начало непрочитанных данных в буфере
+        self._rx_end = 0                      # Конец принятых данных в буфере
+        self._rx_sock = None                  # Сокет, к которому относится содержимое буфера
+        
+        # Счетчик тегов (.tag=) для конвейерного выполнения команд
+        self._next_tag = 0
+        
+        # Состояние сессии
+        self.logged_in = False                # Авторизация на текущем сокете выполнена
+        self.keep_alive = False               # Не закрывать соединение после загрузки (сессия из пула)
+        self.deadline = None                  # Бюджет времени текущей операции (Deadline) или None
+        
+        # Локальный манифест загрузок (DeployManifest) - None если не используется
+        self.deploy_manifest = None
+        
+        # Замеры времени ответа роутера и адаптивные паузы
+        self.pacer = AdaptivePacer()
+        self._sent_at = None                  # Момент последней отправки команды
+        
+    @classmethod
+    def for_router(cls, router):
+        """
+        Создание загрузчика с параметрами подключения роутера.
+        
+        Args:
+            router (RouterConfig): Конфигурация роутера
+            
+        Returns:
+            MikrotikUploader: Загрузчик (соединение еще не установлено)
+        """
+        uploader = cls()
+        uploader.router_ip = router.ip
+        uploader.username = router.username
+        uploader.password = router.password
+        uploader.port = router.port
+        return uploader
+        
     def connect(self):
         """
         Создание TCP сокета и подключение к роутеру.
         
         Процесс подключения:
         1. Создание TCP сокета для IPv4
-        2. Установка таймаута 60 секунд для предотвращения зависания
+        2. Установка таймаута: остаток бюджета операции (deadline) или
+           SOCKET_TIMEOUT секунд для предотвращения зависания
         3. Подключение к указанному IP и порту
         
         Raises:
             socket.error: При ошибке подключения к роутеру
             socket.timeout: При превышении таймаута подключения
+            DeadlineExceeded: Бюджет операции исчерпан
         """
         print(f"🔗 Подключение к {self.router_ip}...")
         
         # Создаем TCP сокет для IPv4 (AF_INET) и потоковый протокол (SOCK_STREAM)
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.logged_in = False
         
-        # Устанавливаем таймаут 60 секунд для всех операций с сокетом
-        # Это предотвращает бесконечное ожидание при потере связи
-        self.sock.settimeout(60)
+        # Таймаут SOCKET_TIMEOUT для всех операций с сокетом предотвращает
+        # бесконечное ожидание при потере связи; при заданном бюджете
+        # операции таймауты выставляются перед каждым вызовом (_apply_deadline)
+        self.sock.settimeout(self.SOCKET_TIMEOUT)
         
         # Подключаемся к роутеру по указанному IP и порту
-        self.sock.connect((self.router_ip, self.port))
+        with self._phase("подключение"):
+            self._apply_deadline()
+            try:
+                self.sock.connect((self.router_ip, self.port))
+            except socket.timeout:
+                if self.deadline is not None:
+                    self.deadline.check()
+                raise
+        
+    def close(self):
+        """Закрытие соединения с роутером (безопасно при отсутствии соединения)."""
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.logged_in = False
+        
+    def has_pending_data(self):
+        """
+        Проверка наличия непрочитанных данных от роутера.
+        
+        Непрочитанные ответы означают, что предыдущая команда не была
+        дочитана до конца - такую сессию нельзя отдавать другой операции.
+        
+        Returns:
+            bool: True если в буфере или сокете есть данные (или соединение закрыто)
+        """
+        if not self.sock:
+            return False
+        if self._rx_sock is self.sock and self._rx_end > self._rx_start:
+            return True
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+        
+    def ensure_session(self):
+        """
+        Гарантирует наличие авторизованного соединения.
+        
+        Если соединение уже установлено и авторизовано (например, сессия
+        получена из RouterSessionPool) - используется оно, иначе выполняются
+        подключение и вход.
+        
+        Returns:
+            bool: True если сессия готова к работе
+        """
+        if self.sock and self.logged_in:
+            return True
+        self.close()
+        self.connect()
+        with self._phase("авторизация"):
+            return self.login()
         
     def write_word(self, word):
         """
         Отправка одного "слова" через API протокол Mikrotik.
         
-        Протокол кодирования длины в API Mikrotik:
+        Протокол кодирования длины в API Mikrotik (см. encode_length):
         - Если длина < 128 байт (0x80): отправляется 1 байт длины
         - Если длина < 16384 байт (0x4000): отправляется 2 байта длины 
           с установленным старшим битом (0x8000)
+        - Большие слова получают 3, 4 или 5 байт длины
         - Затем отправляются сами данные
         
         Обработка кодировки:
@@ -144,32 +851,13 @@ class MikrotikUploader:
         Note:
             Этот метод реализует низкоуровневый протокол API Mikrotik.
             Каждое "слово" - это атомарная единица данных в протоколе.
+            Заголовок и данные уходят одним sendall, поэтому частичная
+            отправка не может обрезать слово.
         """
-        if isinstance(word, bytes):
-            # Если данные уже в байтах - используем как есть
-            data = word
-        else:
-            # Кодируем строку в Windows-1251 для поддержки русских символов в RouterOS
-            # RouterOS поддерживает кодировку Windows-1251 (CP1251)
-            try:
-                data = word.encode("windows-1251", errors="replace")
-            except UnicodeEncodeError:
-                # Если не удается закодировать в Windows-1251, используем UTF-8 как fallback
-                data = word.encode("utf-8", errors="replace")
-                
-        length = len(data)
-        
-        # Кодирование длины по протоколу API Mikrotik
-        if length < 0x80:  # Если длина меньше 128 байт
-            # Отправляем длину в одном байте (big-endian)
-            self.sock.send(length.to_bytes(1, byteorder='big'))
-        elif length < 0x4000:  # Если длина меньше 16384 байт
-            # Устанавливаем старший бит (0x8000) и отправляем в 2 байтах
-            # Формула: (длина | 0x8000) устанавливает флаг многобайтовой длины
-            self.sock.send(((length | 0x8000) & 0xFFFF).to_bytes(2, byteorder='big'))
+        data = encode_word(word)
         
-        # Отправляем сами данные после заголовка длины
-        self.sock.send(data)
+        # Заголовок длины (1-5 байт) и данные отправляем одним вызовом
+        self._send(encode_length(len(data)) + data)
         
     def write_sentence(self, words):
         """
@@ -191,14 +879,128 @@ class MikrotikUploader:
         Note:
             Каждое предложение должно заканчиваться пустым словом.
             Это сигнализирует серверу о завершении команды.
+            Все предложение собирается в один буфер (encode_sentence)
+            и отправляется одним sendall - без серии мелких send.
+        """
+        # Собираем слова и пустое слово-маркер конца в один буфер
+        # и отправляем предложение целиком
+        self._send(encode_sentence(words))
+        
+    def _send(self, data):
+        """Отправка готового буфера предложений с отметкой времени для замера ответа."""
+        self._apply_deadline()
+        self.sock.sendall(data)
+        self._sent_at = time.monotonic()
+    
+    def _apply_deadline(self, limit=None):
+        """
+        Таймаут сокета по бюджету операции перед очередным вызовом.
+        
+        Без бюджета (deadline is None) ничего не делает - действует
+        SOCKET_TIMEOUT. При отмене или исчерпании бюджета сессия
+        помечается непригодной: ответы на отправленные команды могут
+        остаться непрочитанными.
+        
+        Args:
+            limit (float): Наибольший таймаут (срез ожидания)
+            
+        Raises:
+            OperationCancelled, DeadlineExceeded: см. Deadline.check
+        """
+        if self.deadline is None:
+            return
+        try:
+            timeout = self.deadline.socket_timeout(limit)
+        except (OperationCancelled, DeadlineExceeded):
+            self.logged_in = False
+            raise
+        self.sock.settimeout(timeout)
+    
+    def _phase(self, name):
+        """Контекст этапа операции для сообщений об исчерпании бюджета."""
+        if self.deadline is None:
+            return nullcontext()
+        return self.deadline.phase(name)
+    
+    def _sleep(self, seconds, strict=True):
+        """Пауза между этапами (прерывается отменой операции, см. Deadline.sleep)."""
+        if self.deadline is None:
+            time.sleep(seconds)
+        else:
+            self.deadline.sleep(seconds, strict)
+        
+    def _reset_rx_buffer(self):
+        """
+        Сброс буфера приема при смене сокета.
+        
+        Данные, оставшиеся от предыдущего соединения, не относятся к новому
+        и должны быть отброшены до начала чтения.
+        """
+        self._rx_start = 0
+        self._rx_end = 0
+        self._rx_sock = self.sock
+        
+    def _fill_rx_buffer(self, count):
+        """
+        Гарантирует наличие в буфере не менее count непрочитанных байт.
+        
+        Алгоритм:
+        1. Если данных уже достаточно - ничего не делаем
+        2. Если в хвосте буфера не хватает места - сдвигаем непрочитанные
+           данные в начало, а при необходимости увеличиваем буфер
+        3. Дочитываем данные через recv_into прямо в свободную часть буфера
+           (за один вызов приходит столько, сколько отдал TCP стек)
+        
+        Args:
+            count (int): Требуемое количество непрочитанных байт
+            
+        Raises:
+            ConnectionError: Если роутер закрыл соединение
+            socket.timeout: При превышении таймаута чтения
         """
-        # Отправляем каждое слово в предложении
-        for word in words:
-            self.write_word(word)
+        if self._rx_sock is not self.sock:
+            self._reset_rx_buffer()
         
-        # Отправляем пустое слово как маркер конца предложения
-        # Это обязательный элемент протокола API
-        self.write_word('')
+        available = self._rx_end - self._rx_start
+        if available >= count:
+            return
+        if not available:
+            # Буфер полностью прочитан - начинаем заполнение с начала
+            self._rx_start = self._rx_end = 0
+        
+        # Не хватает места в хвосте буфера - освобождаем его
+        if len(self._rx_buffer) - self._rx_start < count:
+            if len(self._rx_buffer) < count:
+                # Слово больше буфера - выделяем буфер нужного размера
+                new_buffer = bytearray(max(count, len(self._rx_buffer) * 2))
+                new_buffer[:available] = self._rx_view[self._rx_start:self._rx_end]
+                self._rx_view.release()
+                self._rx_buffer = new_buffer
+                self._rx_view = memoryview(new_buffer)
+            else:
+                # Сдвигаем непрочитанные данные в начало буфера
+                self._rx_view[:available] = self._rx_view[self._rx_start:self._rx_end]
+            self._rx_start = 0
+            self._rx_end = available
+        
+        while self._rx_end - self._rx_start < count:
+            # С бюджетом операции recv идет срезами - между ними проверяются отмена и остаток
+            self._apply_deadline(Deadline.POLL_INTERVAL)
+            try:
+                received = self.sock.recv_into(self._rx_view[self._rx_end:])
+            except socket.timeout:
+                if self.deadline is not None:
+                    continue  # Срез истек - следующий _apply_deadline проверит бюджет
+                self.logged_in = False
+                raise
+            except OSError:
+                # Ответ прочитан не полностью - поток рассинхронизирован,
+                # сессию нельзя использовать повторно
+                self.logged_in = False
+                raise
+            if not received:
+                raise ConnectionError("Соединение закрыто роутером")
+            self._rx_end += received
         
     def read_word(self):
         """
@@ -206,10 +1008,15 @@ class MikrotikUploader:
         
         Протокол декодирования длины:
         1. Читаем первый байт длины
-        2. Если установлен старший бит (0x80) - читаем второй байт
-        3. Вычисляем полную длину данных
+        2. По старшим битам определяем размер заголовка (1-5 байт)
+        3. Дочитываем остальные байты заголовка и вычисляем длину данных
         4. Читаем указанное количество байт данных
         
+        Буферизация:
+        - Данные принимаются блоками через recv_into в общий bytearray
+        - Длина и содержимое слова разбираются из memoryview без копирования
+        - Один recv_into обычно покрывает десятки слов ответа !re
+        
         Обработка кодировок:
         - Сначала пробуем Windows-1251 (основная кодировка RouterOS для русских символов)
         - При ошибке переходим на UTF-8 с заменой некорректных символов
@@ -221,39 +1028,41 @@ class MikrotikUploader:
             
         Raises:
             socket.error: При ошибке чтения из сокета
+            ConnectionError: Если роутер закрыл соединение
             
         Note:
-            Метод может вызываться многократно для чтения одного recv(),
-            так как TCP может доставлять данные частями.
+            TCP может доставлять данные частями - недостающие байты
+            дочитываются в буфер до получения слова целиком.
         """
-        ret = b''  # Буфер для накопления байтов слова
-        
         # Читаем первый байт длины (всегда присутствует)
-        length = int.from_bytes(self.sock.recv(1), byteorder='big')
+        self._fill_rx_buffer(1)
         
-        # Проверяем старший бит для определения формата длины
-        if length & 0x80:  # Если установлен бит 0x80
-            # Длина кодируется в 2 байтах
-            # Убираем старший бит из первого байта и объединяем со вторым
-            length = ((length & 0x7F) << 8) | int.from_bytes(self.sock.recv(1), byteorder='big')
+        # Старшие биты первого байта определяют размер заголовка длины
+        prefix_size = length_prefix_size(self._rx_buffer[self._rx_start])
+        self._fill_rx_buffer(prefix_size)
+        length = decode_length(self._rx_view[self._rx_start:self._rx_start + prefix_size])
+        self._rx_start += prefix_size
         
-        # Читаем данные слова (может потребоваться несколько вызовов recv)
-        while length > 0:
-            t = self.sock.recv(length)  # Читаем оставшиеся байты
-            ret += t                    # Добавляем к буферу
-            length -= len(t)            # Уменьшаем счетчик оставшихся байт
+        if length == 0:
+            return ''
+        
+        # Дочитываем данные слова в буфер (может потребоваться несколько recv_into)
+        self._fill_rx_buffer(length)
+        start = self._rx_start
+        self._rx_start += length
+        word = self._rx_view[start:self._rx_start]
         
         # Пробуем различные кодировки для декодирования байтов в строку
         try:
             # Сначала пробуем Windows-1251 (основная кодировка RouterOS для русских символов)
-            return ret.decode("windows-1251", errors="replace")
+            return str(word, "windows-1251", "replace")
         except UnicodeDecodeError:
             try:
                 # Затем пробуем UTF-8
-                return ret.decode("utf-8", errors="replace")
+                return str(word, "utf-8", "replace")
             except UnicodeDecodeError:
                 # В крайнем случае используем ASCII с заменой символов
-                return ret.decode("ascii", errors="replace")
+                return str(word, "ascii", "replace")
         
     def read_sentence(self):
         """
@@ -286,6 +1095,13 @@ class MikrotikUploader:
             if not word:  # Пустое слово означает конец предложения
                 break
             ret.append(word)  # Добавляем слово к результату
+        
+        # Время от отправки команды до !done - замер отзывчивости роутера.
+        # Один замер на отправку: следующие !done (конвейер, listen) пришли
+        # позже не из-за роутера и завысили бы оценку
+        if ret and ret[0] == '!done' and self._sent_at is not None:
+            self.pacer.observe(time.monotonic() - self._sent_at)
+            self._sent_at = None
             
         return ret
         
@@ -324,45 +1140,295 @@ class MikrotikUploader:
         # Проверяем результат авторизации по первому слову ответа
         if reply[0] == '!done':
             print("✓ Вход выполнен")
+            self.logged_in = True
             return True
         else:
             print(f"❌ Ошибка входа: {reply}")
             return False
 
-    def verify_script_exists(self, script_name):
+    def execute(self, words):
         """
-        Проверка существования скрипта на роутере.
-        
-        Использует команду /system/script/print с фильтром по имени.
-        Фильтр ?name=script_name ограничивает вывод только нужным скриптом,
-        что повышает производительность при большом количестве скриптов.
-        
-        Алгоритм проверки:
-        1. Отправляем команду печати с фильтром по имени
-        2. Читаем все ответы до получения !done
-        3. Ищем в ответах строки с =name= и сравниваем значения
-        4. Возвращаем результат проверки
+        Выполнение одной команды с чтением всех ответов до !done.
         
         Args:
-            script_name (str): Имя скрипта для проверки существования
+            words (list): Слова команды
             
         Returns:
-            bool: True если скрипт существует на роутере, False если нет
+            list: Все предложения ответа, включая завершающее !done
             
         Note:
-            Метод безопасен - не изменяет состояние роутера, только читает.
+            !trap не прерывает чтение - после него роутер тоже присылает !done,
+            поэтому соединение остается синхронизированным.
         """
-        # Отправляем команду вывода скриптов с фильтром по имени
-        # ?name=script_name - это фильтр API для ограничения результатов
-        # =.proplist=.id,name - запрашиваем только ID и имя (избегаем пагинации больших скриптов)
-        self.write_sentence(['/system/script/print', f'?name={script_name}', '=.proplist=.id,name'])
-        
-        exists = False  # Флаг существования скрипта
-        
-        # Читаем все ответы до завершения команды
+        self.write_sentence(words)
+        replies = []
         while True:
             reply = self.read_sentence()
-            if not reply:  # Пустой ответ - завершаем чтение
+            if not reply:
+                break
+            replies.append(reply)
+            if reply[0] == '!done':
+                break
+            if reply[0] == '!fatal':
+                raise ConnectionError(f"Роутер закрыл сессию: {reply}")
+        return replies
+    
+    def iter_records(self, menu, record_class, queries=(), properties=None):
+        """
+        Потоковое чтение листинга меню в виде записей record_class.
+        
+        Отправляет {menu}/print с =.proplist= (только свойства записи или
+        переданный поднабор properties) и отдает записи по мере чтения
+        предложений !re - листинг не накапливается в памяти целиком.
+        
+        Если потребитель прекратил перебор раньше !done, остаток ответа
+        дочитывается при закрытии генератора, чтобы сессия осталась
+        синхронизированной и пригодной для повторного использования.
+        
+        Args:
+            menu (str): Путь меню, например '/system/script'
+            record_class (type): Подкласс RouterRecord
+            queries (iterable): Слова запроса (?name=...) для фильтрации
+            properties (list): Поднабор ключей record_class.PROPERTIES
+        
+        Yields:
+            RouterRecord: Записи в порядке ответа роутера
+        
+        Raises:
+            RouterOSTrapError: Роутер отклонил команду (после чтения !done)
+            ConnectionError: При получении !fatal
+        """
+        command = f'{menu}/print'
+        self.write_sentence([command, record_class.proplist(properties), *queries])
+        trap = None
+        try:
+            while True:
+                reply = self.read_sentence()
+                if not reply:
+                    continue
+                kind = reply[0]
+                if kind == '!re':
+                    yield record_class.from_sentence(reply)
+                elif kind == '!done':
+                    break
+                elif kind == '!trap':
+                    trap = reply
+                elif kind == '!fatal':
+                    raise ConnectionError(f"Роутер закрыл сессию: {reply}")
+        except GeneratorExit:
+            # Перебор прерван потребителем - дочитываем ответ до !done
+            try:
+                while True:
+                    reply = self.read_sentence()
+                    if reply and reply[0] in ('!done', '!fatal'):
+                        break
+            except OSError:
+                self.logged_in = False
+            raise
+        if trap:
+            raise RouterOSTrapError(command, trap)
+    
+    def fetch_records(self, menu, record_class, queries=(), properties=None):
+        """Листинг меню целиком списком записей (см. iter_records)."""
+        return list(self.iter_records(menu, record_class, queries, properties))
+    
+    def execute_pipelined(self, commands, window=None):
+        """
+        Конвейерное выполнение нескольких команд на одном соединении.
+        
+        RouterOS API позволяет держать несколько команд "в полете": каждая
+        команда получает уникальный .tag=, а ответы (!re, !trap, !done)
+        несут тот же тег и сопоставляются с командой по мере поступления.
+        
+        Алгоритм:
+        1. До window команд с тегами собираются в один буфер и
+           отправляются одним sendall
+        2. Ответы читаются и раскладываются по командам по тегу
+        3. Команда завершена при получении ее !done - освободившееся место
+           в окне сразу занимает следующая команда
+        
+        Так N однотипных запросов (проверки существования, добавление
+        скриптов) занимают несколько RTT вместо N.
+        
+        Args:
+            commands (list): Список команд (каждая - список слов)
+            window (int): Максимум одновременно выполняемых команд
+                (по умолчанию PIPELINE_WINDOW)
+            
+        Returns:
+            list: Ответы в порядке команд. Каждый ответ - список предложений
+                  (включая !done) без служебного слова .tag=
+                  
+        Raises:
+            ConnectionError: При получении !fatal
+        """
+        window = window or self.PIPELINE_WINDOW
+        results = [[] for _ in commands]
+        pending = {}      # тег -> индекс команды
+        next_index = 0    # Следующая неотправленная команда
+        
+        while next_index < len(commands) or pending:
+            # Заполняем окно новыми командами - одним буфером
+            batch = bytearray()
+            while next_index < len(commands) and len(pending) < window:
+                tag = self._new_tag()
+                batch += encode_sentence(list(commands[next_index]) + [f'.tag={tag}'])
+                pending[tag] = next_index
+                next_index += 1
+            if batch:
+                self._send(batch)
+            
+            reply = self.read_sentence()
+            if not reply:
+                continue
+            if reply[0] == '!fatal':
+                raise ConnectionError(f"Роутер закрыл сессию: {reply}")
+            
+            tag = self._pop_tag(reply)
+            if tag not in pending:
+                continue  # Ответ на чужую или уже завершенную команду
+            
+            results[pending[tag]].append(reply)
+            if reply[0] == '!done':
+                del pending[tag]
+        
+        return results
+    
+    @staticmethod
+    def _pop_tag(reply):
+        """Извлечение и удаление слова .tag= из предложения ответа (None если тега нет)."""
+        # Тег обычно последнее слово предложения - ищем с конца
+        for position in range(len(reply) - 1, 0, -1):
+            if reply[position].startswith('.tag='):
+                tag = reply[position][5:]
+                del reply[position]
+                return tag
+        return None
+    
+    def _new_tag(self):
+        """Следующий уникальный тег команды для этого соединения."""
+        tag = str(self._next_tag)
+        self._next_tag += 1
+        return tag
+    
+    def _wait_readable(self, timeout):
+        """
+        Ожидание данных от роутера не дольше timeout секунд (True если данные есть).
+        
+        С бюджетом операции ожидание идет срезами по Deadline.POLL_INTERVAL,
+        чтобы отмена и исчерпание бюджета прерывали его сразу.
+        """
+        if self._rx_sock is self.sock and self._rx_end > self._rx_start:
+            return True
+        expires_at = time.monotonic() + max(0.0, timeout)
+        while True:
+            wait = max(0.0, expires_at - time.monotonic())
+            if self.deadline is not None:
+                try:
+                    wait = self.deadline.socket_timeout(min(wait, Deadline.POLL_INTERVAL))
+                except (OperationCancelled, DeadlineExceeded):
+                    self.logged_in = False
+                    raise
+            readable, _, _ = select.select([self.sock], [], [], wait)
+            if readable:
+                return True
+            if time.monotonic() >= expires_at:
+                return False
+    
+    def verify_scripts_exist(self, script_names):
+        """
+        Пакетная проверка существования скриптов.
+        
+        Все имена проверяются одним /system/script/print с OR-запросом
+        (?name=a ?name=b ?#| ...) и =.proplist=name - один RTT на любое
+        количество имен (очень длинные списки делятся на несколько print,
+        отправляемых конвейером).
+        
+        Args:
+            script_names (iterable): Имена скриптов для проверки
+            
+        Returns:
+            set: Имена скриптов, существующих на роутере
+        """
+        return self._verify_items_exist('/system/script', script_names)
+    
+    def _exists_commands(self, menu, names):
+        """Команды print для проверки существования объектов по именам."""
+        names = list(dict.fromkeys(names))
+        step = self.VERIFY_QUERY_NAMES
+        return [[f'{menu}/print', '=.proplist=name', *RouterQuery().any_of('name', names[start:start + step])]
+                for start in range(0, len(names), step)]
+    
+    @staticmethod
+    def _names_in_replies(replies):
+        """Имена объектов из ответов print (списки предложений execute_pipelined)."""
+        return {word[6:] for reply in replies for sentence in reply if sentence[0] == '!re'
+                for word in sentence if word.startswith('=name=')}
+    
+    def _verify_items_exist(self, menu, names):
+        """Проверка существования объектов меню по именам одним OR-запросом."""
+        names = set(names)
+        commands = self._exists_commands(menu, names)
+        if not commands:
+            return set()
+        return self._names_in_replies(self.execute_pipelined(commands)) & names
+    
+    def fetch_script_fingerprints(self, query=()):
+        """
+        Получение отпечатков содержимого всех скриптов роутера одним запросом.
+        
+        Запрашиваются только имя и комментарий (=.proplist=name,comment) -
+        исходники скриптов не передаются.
+        
+        Args:
+            query (RouterQuery): Фильтр скриптов на стороне роутера
+                (по умолчанию - все скрипты)
+        
+        Returns:
+            dict: имя скрипта -> отпечаток (см. script_fingerprint) или None,
+                  если скрипт загружен без отпечатка
+        """
+        fingerprints = {}
+        for script in self.iter_records('/system/script', ScriptRecord, query, properties=['name', 'comment']):
+            if script.name:
+                fingerprints[script.name] = (script.comment
+                                             if script.comment.startswith(FINGERPRINT_PREFIX) else None)
+        return fingerprints
+    
+    def verify_script_exists(self, script_name):
+        """
+        Проверка существования скрипта на роутере.
+        
+        Использует команду /system/script/print с фильтром по имени.
+        Фильтр ?name=script_name ограничивает вывод только нужным скриптом,
+        что повышает производительность при большом количестве скриптов.
+        
+        Алгоритм проверки:
+        1. Отправляем команду печати с фильтром по имени
+        2. Читаем все ответы до получения !done
+        3. Ищем в ответах строки с =name= и сравниваем значения
+        4. Возвращаем результат проверки
+        
+        Args:
+            script_name (str): Имя скрипта для проверки существования
+            
+        Returns:
+            bool: True если скрипт существует на роутере, False если нет
+            
+        Note:
+            Метод безопасен - не изменяет состояние роутера, только читает.
+        """
+        # Отправляем команду вывода скриптов с фильтром по имени
+        # ?name=script_name - это фильтр API для ограничения результатов
+        # =.proplist=.id,name - запрашиваем только ID и имя (избегаем пагинации больших скриптов)
+        self.write_sentence(['/system/script/print', f'?name={script_name}', '=.proplist=.id,name'])
+        
+        exists = False  # Флаг существования скрипта
+        
+        # Читаем все ответы до завершения команды
+        while True:
+            reply = self.read_sentence()
+            if not reply:  # Пустой ответ - завершаем чтение
                 break
                 
             if reply[0] == '!re':  # !re означает строку данных
@@ -377,51 +1443,326 @@ class MikrotikUploader:
                 
         return exists
 
-    def verify_scheduler_exists(self, scheduler_name):
+    def wait_for_script(self, script_name, present=True, timeout=60.0):
+        """
+        Ожидание появления (или исчезновения) скрипта на роутере.
+        
+        Args:
+            script_name (str): Имя скрипта
+            present (bool): True - ждем появления, False - ждем удаления
+            timeout (float): Максимальное время ожидания в секундах
+            
+        Returns:
+            bool: True если нужное состояние достигнуто до истечения таймаута
+        """
+        return self._wait_for_item('/system/script', script_name, present, timeout)
+    
+    def wait_for_scheduler(self, scheduler_name, present=True, timeout=60.0):
+        """
+        Ожидание появления (или исчезновения) шедулера (аналог wait_for_script).
+        
+        Returns:
+            bool: True если нужное состояние достигнуто до истечения таймаута
         """
-        Проверка существования шедулера на роутере.
+        return self._wait_for_item('/system/scheduler', scheduler_name, present, timeout)
+    
+    def _wait_for_item(self, menu, name, present, timeout):
+        """
+        Ожидание состояния объекта меню по событиям API.
         
-        Аналогична verify_script_exists, но для системных шедулеров.
-        Использует команду /system/scheduler/print для получения списка задач.
+        Вместо периодического переподключения и повторной проверки
+        используется поток изменений {menu}/listen: роутер сам присылает
+        !re при добавлении, изменении и удалении (=.dead=true) объекта,
+        поэтому ожидание завершается сразу после события.
         
-        Шедулеры в RouterOS:
-        - Позволяют запускать скрипты по расписанию
-        - Могут выполняться однократно или периодически
-        - Поддерживают различные политики безопасности
+        Если listen недоступен (!trap) - используется опрос на том же
+        соединении с экспоненциально растущей паузой (0.1 → 1 сек).
         
         Args:
-            scheduler_name (str): Имя шедулера для проверки
+            menu (str): Меню RouterOS, например '/system/script'
+            name (str): Имя объекта
+            present (bool): Ожидаемое состояние - существует / не существует
+            timeout (float): Максимальное время ожидания в секундах
             
         Returns:
-            bool: True если шедулер существует, False если нет
-            
-        Note:
-            Используется для проверки перед созданием новых шедулеров
-            и для очистки временных шедулеров после выполнения задач.
+            bool: True если состояние достигнуто до истечения таймаута
         """
-        # Отправляем команду вывода шедулеров с фильтром по имени
-        # =.proplist=.id,name - запрашиваем только ID и имя (избегаем пагинации)
-        self.write_sentence(['/system/scheduler/print', f'?name={scheduler_name}', '=.proplist=.id,name'])
+        deadline = time.monotonic() + timeout
+        with self._phase(f"ожидание {name}"):
+            result = self._listen_for_item(menu, name, present, deadline)
+            if result is None:
+                result = self._poll_for_item(menu, name, present, deadline)
+        return result
+    
+    def _listen_for_item(self, menu, name, present, deadline):
+        """
+        Ожидание через {menu}/listen.
+        
+        Алгоритм:
+        1. Одним sendall отправляются listen и print ?name= (оба с тегами) -
+           listen запущен раньше print, поэтому изменение между ними не
+           будет пропущено
+        2. print дает начальный набор .id объектов с этим именем,
+           события listen дополняют его (новые объекты) и сокращают
+           (=.dead=true, переименование)
+        3. После достижения состояния listen отменяется через /cancel,
+           и все ответы дочитываются - соединение остается пригодным
+           для дальнейших команд
         
-        exists = False  # Флаг существования шедулера
+        Returns:
+            bool|None: True/False - результат ожидания,
+                       None - listen не поддерживается роутером
+        """
+        listen_tag = self._new_tag()
+        print_tag = self._new_tag()
+        self._send(
+            encode_sentence([f'{menu}/listen', f'.tag={listen_tag}']) +
+            encode_sentence([f'{menu}/print', f'?name={name}', '=.proplist=.id,name',
+                             f'.tag={print_tag}']))
+        
+        ids = set()            # .id объектов с нужным именем
+        listen_active = True   # listen еще не завершен роутером
+        listen_failed = False  # listen отклонен (!trap) - нужен опрос
+        print_active = True
+        reached = False
         
-        # Обрабатываем ответы аналогично проверке скриптов
         while True:
+            if not print_active:
+                if bool(ids) == present:
+                    reached = True
+                    break
+                if not listen_active:
+                    break
+            if not self._wait_readable(deadline - time.monotonic()):
+                break  # Таймаут ожидания
+            
             reply = self.read_sentence()
             if not reply:
-                break
-                
-            if reply[0] == '!re':  # Строка данных шедулера
-                # Ищем имя шедулера в параметрах
-                for word in reply:
-                    if word.startswith('=name=') and word[6:] == scheduler_name:
-                        exists = True
-                        break
-            elif reply[0] == '!done':  # Конец вывода
-                break
-                
-        return exists
-
+                continue
+            if reply[0] == '!fatal':
+                raise ConnectionError(f"Роутер закрыл сессию: {reply}")
+            tag = self._pop_tag(reply)
+            
+            if tag == print_tag:
+                if reply[0] == '!re':
+                    item = dict(word[1:].split('=', 1) for word in reply[1:] if word.startswith('='))
+                    if item.get('name') == name:
+                        ids.add(item.get('.id'))
+                elif reply[0] == '!done':
+                    print_active = False
+            elif tag == listen_tag:
+                if reply[0] == '!trap':
+                    listen_failed = True
+                elif reply[0] == '!done':
+                    listen_active = False
+                elif reply[0] == '!re':
+                    item = dict(word[1:].split('=', 1) for word in reply[1:] if word.startswith('='))
+                    item_id = item.get('.id')
+                    if item.get('.dead') in ('true', 'yes'):
+                        ids.discard(item_id)
+                    elif item.get('name') == name:
+                        ids.add(item_id)
+                    elif 'name' in item:
+                        ids.discard(item_id)  # Объект переименован
+        
+        self._finish_listen(listen_tag if listen_active else None,
+                            print_tag if print_active else None)
+        if listen_failed and not reached:
+            return None
+        return reached
+    
+    def _finish_listen(self, listen_tag, print_tag, grace=5.0):
+        """
+        Отмена listen и дочитывание оставшихся ответов.
+        
+        После /cancel роутер завершает listen (!trap interrupted + !done)
+        и подтверждает саму отмену. Если ответы не пришли за grace секунд,
+        поток ответов считается рассинхронизированным и сессия помечается
+        непригодной для повторного использования.
+        """
+        waiting = {tag for tag in (listen_tag, print_tag) if tag is not None}
+        if not waiting:
+            return
+        if listen_tag is not None:
+            cancel_tag = self._new_tag()
+            self.write_sentence(['/cancel', f'=tag={listen_tag}', f'.tag={cancel_tag}'])
+            waiting.add(cancel_tag)
+        
+        deadline = time.monotonic() + grace
+        while waiting:
+            if not self._wait_readable(deadline - time.monotonic()):
+                self.logged_in = False
+                return
+            reply = self.read_sentence()
+            if not reply:
+                continue
+            tag = self._pop_tag(reply)
+            if reply[0] == '!done':
+                waiting.discard(tag)
+    
+    def _poll_for_item(self, menu, name, present, deadline):
+        """Ожидание опросом на текущем соединении с экспоненциальной паузой."""
+        delay = 0.1
+        while True:
+            if (name in self._verify_items_exist(menu, [name])) == present:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+    
+    def remove_scripts(self, script_names):
+        """
+        Пакетное удаление скриптов за три запроса на любое количество имен.
+        
+        Returns:
+            dict: имя -> True если скрипта больше нет на роутере
+        """
+        return self._remove_items('/system/script', script_names)
+    
+    def remove_schedulers(self, scheduler_names):
+        """
+        Пакетное удаление шедулеров (аналог remove_scripts).
+        
+        Returns:
+            dict: имя -> True если шедулера больше нет на роутере
+        """
+        return self._remove_items('/system/scheduler', scheduler_names)
+    
+    def _remove_items(self, menu, names):
+        """
+        Пакетное удаление объектов меню по именам.
+        
+        Алгоритм:
+        1. Все .id находятся одним print с OR-запросом по именам
+        2. Все объекты удаляются одной командой remove со списком
+           .id через запятую
+        3. Результат подтверждается одной пакетной проверкой
+           существования (_verify_items_exist)
+        
+        Если общий remove отклонен (!trap - например, объект уже удален
+        кем-то другим), объекты удаляются по одному конвейером.
+        
+        Args:
+            menu (str): Меню RouterOS, например '/system/script'
+            names (iterable): Имена объектов
+            
+        Returns:
+            dict: имя -> True если объекта больше нет на роутере
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        
+        # Шаг 1: ID всех объектов одним запросом
+        ids = [item_id for item_ids in self._resolve_ids(menu, names).values() for item_id in item_ids]
+        
+        # Шаг 2: Удаление одной командой
+        if ids:
+            self._apply_to_ids(f'{menu}/remove', ids)
+        
+        # Шаг 3: Одна проверка для всех имен
+        remaining = self._verify_items_exist(menu, names) if ids else set()
+        return {name: name not in remaining for name in names}
+    
+    def _resolve_ids(self, menu, names):
+        """
+        Поиск .id объектов по именам print с OR-запросом.
+        
+        Списки длиннее VERIFY_QUERY_NAMES делятся на несколько print,
+        отправляемых одной конвейерной пачкой (как в _exists_commands).
+        
+        Returns:
+            dict: имя -> список .id (только найденные имена)
+        """
+        ids = {}
+        names = list(dict.fromkeys(names))
+        step = self.VERIFY_QUERY_NAMES
+        commands = [[f'{menu}/print', '=.proplist=.id,name', *RouterQuery().any_of('name', names[start:start + step])]
+                    for start in range(0, len(names), step)]
+        if not commands:
+            return ids
+        for reply in self.execute_pipelined(commands):
+            for sentence in reply:
+                if sentence[0] != '!re':
+                    continue
+                item = dict(word[1:].split('=', 1) for word in sentence[1:] if word.startswith('='))
+                if '.id' in item and 'name' in item:
+                    ids.setdefault(item['name'], []).append(item['.id'])
+        return ids
+    
+    def _apply_to_ids(self, command, ids, words=()):
+        """
+        Выполнение команды (set, remove, stop) сразу для многих объектов.
+        
+        Команда отправляется один раз со списком .id через запятую, ответ
+        дочитывается до !done. Если роутер отклонил общий вызов (!trap -
+        например, один из объектов уже исчез), команда повторяется для
+        каждого .id отдельно одной конвейерной пачкой.
+        
+        Args:
+            command (str): Команда, например '/system/scheduler/set'
+            ids (list): Внутренние .id объектов
+            words (iterable): Дополнительные слова команды (=disabled=yes)
+            
+        Returns:
+            set: .id объектов, для которых команда выполнена без ошибки
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return set()
+        replies = self.execute([command, f'=.id={",".join(ids)}', *words])
+        if not any(reply[0] == '!trap' for reply in replies):
+            return set(ids)
+        
+        replies = self.execute_pipelined([[command, f'=.id={item_id}', *words] for item_id in ids])
+        return {item_id for item_id, reply in zip(ids, replies)
+                if not any(sentence[0] == '!trap' for sentence in reply)}
+    
+    def set_schedulers_disabled(self, scheduler_names, disabled):
+        """
+        Пакетное включение/отключение шедулеров: один print + один set.
+        
+        Args:
+            scheduler_names (iterable): Имена шедулеров
+            disabled (bool): True - отключить, False - включить
+            
+        Returns:
+            dict: имя -> True если состояние изменено (False - не найден или ошибка)
+        """
+        names = list(dict.fromkeys(scheduler_names))
+        ids = self._resolve_ids('/system/scheduler', names)
+        applied = self._apply_to_ids(
+            '/system/scheduler/set',
+            [item_id for item_ids in ids.values() for item_id in item_ids],
+            [f'=disabled={"yes" if disabled else "no"}'])
+        return {name: bool(ids.get(name)) and all(item_id in applied for item_id in ids[name])
+                for name in names}
+    
+    def stop_jobs(self, job_ids):
+        """
+        Остановка задач (/system/script/job) одной командой.
+        
+        Returns:
+            set: ID остановленных задач
+        """
+        return self._apply_to_ids('/system/script/job/stop', [str(job_id) for job_id in job_ids])
+    
+    def remove_finished_jobs(self):
+        """
+        Удаление всех завершенных задач: один print + один remove.
+        
+        Returns:
+            tuple: (ID найденных завершенных задач, множество удаленных ID)
+        """
+        # Завершенные задачи - статус есть и он не running (фильтр на роутере)
+        finished_query = RouterQuery().has('status').not_equal('status', 'running')
+        finished = [job.id for job in self.iter_records('/system/script/job', JobRecord,
+                                                        finished_query, properties=['.id'])
+                    if job.id]
+        return finished, self._apply_to_ids('/system/script/job/remove', finished)
+    
     def remove_script(self, script_name):
         """
         Удаление скрипта с проверкой существования.
@@ -429,8 +1770,8 @@ class MikrotikUploader:
         Безопасный алгоритм удаления:
         1. Получаем ID скрипта через /system/script/print с фильтром
         2. Если скрипт найден - удаляем его по ID через /system/script/remove
-        3. Ждем завершения операции (пауза 1 сек)
-        4. Проверяем что скрипт действительно удален
+        3. Ждем события удаления (wait_for_script, без переподключений)
+        4. Убеждаемся что скрипт действительно удален
         5. Возвращаем результат операции
         
         Использование ID вместо имени:
@@ -479,19 +1820,15 @@ class MikrotikUploader:
                 if not reply or reply[0] == '!done':
                     break
             
-            # Шаг 3: Умная проверка удаления
-            for attempt in range(10):  # Максимум 10 попыток = 10 секунд
-                time.sleep(1)
-                
-                # Переподключаемся для свежих данных
-                if not self.reconnect_for_fresh_data():
-                    continue
-                    
-                # Проверяем что скрипт удален
-                if not self.verify_script_exists(script_name):
-                    if attempt > 0:  # Показываем время только если было ожидание
-                        print(f"✅ Скрипт удален через {attempt + 1} секунд")
-                    return True
+            # Шаг 3: Ожидание фактического удаления
+            # Событие удаления приходит через listen на том же соединении -
+            # без переподключений и фиксированных пауз
+            started = time.monotonic()
+            if self.wait_for_script(script_name, present=False, timeout=10.0):
+                elapsed = time.monotonic() - started
+                if elapsed >= 1:  # Показываем время только если было ожидание
+                    print(f"✅ Скрипт удален через {elapsed:.1f} секунд")
+                return True
             
             print(f"❌ Ошибка: скрипт {script_name} не был удален за 10 секунд")
             return False
@@ -506,8 +1843,8 @@ class MikrotikUploader:
         Безопасный алгоритм удаления (аналогично remove_script):
         1. Получаем ID шедулера через /system/scheduler/print с фильтром
         2. Если шедулер найден - удаляем его по ID через /system/scheduler/remove
-        3. Ждем завершения операции (пауза 1 сек)
-        4. Проверяем что шедулер действительно удален
+        3. Ждем события удаления (wait_for_scheduler, без переподключений)
+        4. Убеждаемся что шедулер действительно удален
         5. Возвращаем результат операции
         
         Использование ID вместо имени:
@@ -556,19 +1893,15 @@ class MikrotikUploader:
                 if not reply or reply[0] == '!done':
                     break
             
-            # Шаг 3: Умная проверка удаления шедулера
-            for attempt in range(10):  # Максимум 10 попыток = 10 секунд
-                time.sleep(1)
-                
-                # Переподключаемся для свежих данных
-                if not self.reconnect_for_fresh_data():
-                    continue
-                    
-                # Проверяем что шедулер удален
-                if not self.verify_scheduler_exists(scheduler_name):
-                    if attempt > 0:  # Показываем время только если было ожидание
-                        print(f"✅ Шедулер удален через {attempt + 1} секунд")
-                    return True
+            # Шаг 3: Ожидание фактического удаления
+            # Событие удаления приходит через listen на том же соединении -
+            # без переподключений и фиксированных пауз
+            started = time.monotonic()
+            if self.wait_for_scheduler(scheduler_name, present=False, timeout=10.0):
+                elapsed = time.monotonic() - started
+                if elapsed >= 1:  # Показываем время только если было ожидание
+                    print(f"✅ Шедулер удален через {elapsed:.1f} секунд")
+                return True
             
             print(f"❌ Ошибка: шедулер {scheduler_name} не был удален за 10 секунд")
             return False
@@ -576,35 +1909,12 @@ class MikrotikUploader:
         # Шедулер не существует - считаем что цель достигнута
         return True
 
-    def reconnect_for_fresh_data(self):
-        """
-        Переподключение для получения свежих данных после асинхронных операций.
-        
-        Используется когда планировщики RouterOS выполняют операции асинхронно
-        и старое API соединение может не видеть изменения.
-        
-        Returns:
-            bool: True если переподключение успешно, False при ошибке
-        """
-        try:
-            if hasattr(self, 'sock') and self.sock:
-                self.sock.close()
-                
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.settimeout(60)
-            self.sock.connect((self.router_ip, self.port))
-            
-            return self.login()
-        except Exception as e:
-            print(f"❌ Ошибка переподключения: {e}")
-            return False
-
-    def get_mikrotik_time(self):
+    def get_mikrotik_time(self, lead_seconds=None):
         """
         Получение текущего времени с роутера для создания шедулеров.
         
         Использует команду /system/clock/print для получения системного времени роутера.
-        Добавляет 5 секунд к текущему времени для создания шедулера в ближайшем будущем.
+        Добавляет запас lead_seconds к текущему времени для создания шедулера в ближайшем будущем.
         
         Зачем нужно время роутера:
         - Шедулеры работают по времени роутера, не клиента
@@ -612,79 +1922,129 @@ class MikrotikUploader:
         - Учитываем возможную разницу во времени между системами
         
         Логика добавления времени:
-        - +5 секунд: достаточно для завершения создания шедулера
-        - Обработка переполнения секунд/минут/часов
+        - Запас по умолчанию берется из pacer.scheduler_lead(): на быстром
+          роутере 2 секунды, на медленном - до scheduler_lead_max (5 секунд)
         - Корректная обработка перехода через полночь
         
+        Args:
+            lead_seconds (int): Запас времени в секундах (None - адаптивный)
+        
         Returns:
             str: Время в формате HH:MM:SS для использования в шедулере
             None: При ошибке получения времени
             
         Example:
-            Если текущее время роутера 14:30:25, метод вернет "14:30:30"
+            Если текущее время роутера 14:30:25 и запас 5 секунд, метод вернет "14:30:30"
         """
-        # Получаем информацию о системных часах роутера
-        self.write_sentence(['/system/clock/print'])
-        clock_data = self.read_sentence()
-        
-        # Ищем параметр времени в ответе
-        for line in clock_data:
-            if line.startswith('=time='):
-                time_str = line[6:]  # Убираем префикс "=time="
-                try:
-                    # Парсим время в формате HH:MM:SS
-                    h, m, s = map(int, time_str.split(':'))
-                    
-                    # Добавляем 5 секунд для запуска шедулера в будущем
-                    s += 5
+        if lead_seconds is None:
+            lead_seconds = self.pacer.scheduler_lead()
+        
+        # Получаем информацию о системных часах роутера (ответ читается до !done)
+        for clock_data in self.execute(['/system/clock/print', '=.proplist=time']):
+            # Ищем параметр времени в ответе
+            for line in clock_data:
+                if line.startswith('=time='):
+                    time_str = line[6:]  # Убираем префикс "=time="
+                    try:
+                        # Парсим время в формате HH:MM:SS
+                        h, m, s = map(int, time_str.split(':'))
+                    except ValueError:
+                        # Ошибка парсинга времени
+                        return None
                     
-                    # Обрабатываем переполнение времени
-                    if s >= 60:  # Переполнение секунд
-                        s -= 60
-                        m += 1
-                        if m >= 60:  # Переполнение минут
-                            m -= 60
-                            h += 1
-                            if h >= 24:  # Переполнение часов (переход через полночь)
-                                h -= 24
-                                
-                    # Возвращаем отформатированное время
-                    return f"{h:02d}:{m:02d}:{s:02d}"
-                except ValueError:
-                    # Ошибка парсинга времени - прерываем обработку
-                    break
+                    # Добавляем запас с переходом через полночь
+                    total = (h * 3600 + m * 60 + s + lead_seconds) % 86400
+                    return f"{total // 3600:02d}:{total // 60 % 60:02d}:{total % 60:02d}"
                     
-        return None  # Время не получено или произошла ошибка
+        return None  # Время не получено
+    
+    def _record_deploy(self, deployed):
+        """Учет загруженных скриптов в манифесте (тройки имя, содержимое, части)."""
+        if self.deploy_manifest is None or not deployed:
+            return
+        try:
+            self.deploy_manifest.record(
+                DeployManifest.router_key(self.router_ip, self.port), deployed)
+        except OSError as e:
+            print(f"⚠️  Не удалось обновить манифест загрузок: {e}")
+    
+    def _record_direct_rejected(self, script_names):
+        """Учет в манифесте скриптов, отклоненных роутером при загрузке одной командой."""
+        if self.deploy_manifest is None or not script_names:
+            return
+        try:
+            self.deploy_manifest.mark_direct_rejected(
+                DeployManifest.router_key(self.router_ip, self.port), script_names)
+        except OSError as e:
+            print(f"⚠️  Не удалось обновить манифест загрузок: {e}")
     
     def upload_script(self, script_name, content):
-        """Загрузка скрипта с проверкой"""
-        # Для больших файлов используем специальный метод
-        if len(content) > 15000 and not script_name.endswith(('-TEMP1', '-TEMP2', '-Combine')):
+        """
+        Загрузка скрипта с проверкой.
+        
+        Большие скрипты (> LARGE_SCRIPT_THRESHOLD) загружаются в зависимости
+        от large_upload_mode:
+        - "direct": одной командой /system/script/add, как и обычные скрипты.
+          Если роутер отклонит команду - автоматически используется разделение
+        - "split": через upload_large_script (TEMP части + объединение)
+        """
+        is_large = (encoded_size(content) > self.LARGE_SCRIPT_THRESHOLD and
+                    not script_name.endswith(('-TEMP1', '-TEMP2', '-Combine')))
+        
+        # Для больших файлов в режиме разделения используем специальный метод
+        if is_large and self.large_upload_mode != "direct":
+            return self.upload_large_script(script_name, content)
+        
+        # Роутер уже отклонял этот скрипт одной командой - сразу разделяем
+        if is_large and self.deploy_manifest is not None:
+            if self.deploy_manifest.is_direct_rejected(
+                    DeployManifest.router_key(self.router_ip, self.port), script_name):
+                print(f"📑 {script_name}: по манифесту роутер отклонял его одной командой - сразу используем разделение")
+                return self.upload_large_script(script_name, content)
+        
+        result = self.upload_script_direct(script_name, content, allow_fallback=is_large)
+        if result is None:
+            print(f"⚠️  Роутер отклонил скрипт одной командой - используем разделение на части")
             return self.upload_large_script(script_name, content)
+        return result
+    
+    def upload_script_direct(self, script_name, content, allow_fallback=False):
+        """
+        Загрузка скрипта одним предложением /system/script/add.
         
-        sock = None
+        Благодаря многобайтовой длине слова (encode_length) так загружаются
+        и скрипты больше 16KB - за один запрос вместо TEMP частей,
+        combine-скрипта и планировщика.
+        
+        Args:
+            script_name (str): Имя скрипта
+            content (str): Содержимое скрипта
+            allow_fallback (bool): Вернуть None при !trap на команду add,
+                чтобы вызывающий код мог перейти к загрузке по частям
+                
+        Returns:
+            bool: Результат загрузки
+            None: Команда отклонена роутером и разрешен переход к разделению
+        """
         try:
             print(f"\n📤 {script_name} ({len(content)} байт)...")
             
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(60)
-            sock.connect((self.router_ip, self.port))
-            self.sock = sock
-            
-            if not self.login():
+            # Используем уже открытую сессию (из пула) или подключаемся заново
+            if not self.ensure_session():
                 return False
     
             # Удаление старого скрипта если есть
             if not self.remove_script(script_name):
                 return False
             
-            content = content.replace('\r\n', '\n').replace('\r', '\n')
+            content = normalize_newlines(content)
             
-            # Загрузка
+            # Загрузка (отпечаток содержимого - в комментарий скрипта)
             self.write_sentence([
                 '/system/script/add',
                 f'=name={script_name}',
                 f'=source={content}',
+                f'=comment={script_fingerprint(content)}',
                 '=policy=read,write,policy,test,sensitive,ftp,reboot,password,sniff,romon'
             ])
             
@@ -699,6 +2059,9 @@ class MikrotikUploader:
                     break
                 elif reply[0] == '!trap':
                     print(f"❌ Ошибка: {reply}")
+                    if allow_fallback:
+                        self._record_direct_rejected([script_name])
+                        return None
                     return False
             
             if success:
@@ -706,6 +2069,7 @@ class MikrotikUploader:
                 if self.verify_script_exists(script_name):
                     print(f"✅ {script_name} загружен")
                     self.uploaded_count += 1
+                    self._record_deploy([(script_name, content, 1)])
                     return True
                 else:
                     print(f"❌ Ошибка: скрипт {script_name} не найден после загрузки")
@@ -716,16 +2080,437 @@ class MikrotikUploader:
                 self.failed_count += 1
                 return False
             
+        except (OperationCancelled, DeadlineExceeded) as e:
+            print(f"❌ {script_name}: {e}")
+            self.failed_count += 1
+            self.close()
+            raise
         except Exception as e:
             print(f"❌ Ошибка {script_name}: {e}")
             self.failed_count += 1
+            # Состояние соединения после ошибки неизвестно - не используем его повторно
+            self.close()
             return False
         finally:
-            if sock:
-                sock.close()
-            time.sleep(1)  # Сокращенная пауза для стабилизации
+            if not self.keep_alive:
+                self.close()
+            self._sleep(self.pacer.settle_delay(), strict=False)  # Пауза по отзывчивости роутера (не больше settle_max)
 
-    def upload_large_script(self, script_name, content):
+    def upload_scripts(self, scripts):
+        """
+        Пакетная загрузка скриптов конвейером команд на одном соединении.
+        
+        Вместо цепочки "print id → remove → add → verify" на каждый скрипт
+        все скрипты проходят каждый этап одной конвейерной пачкой:
+        1. Поиск ID всех копий старых версий и остатков прерванной
+           загрузки (<имя>-NEW) - один print с OR-запросом
+        2. Добавление новых версий под временным именем <имя>-NEW
+        3. Удаление всех копий старых версий добавленных скриптов и
+           переименование новых версий в рабочие имена
+        4. Проверка существования всех загруженных скриптов
+        
+        Старая версия удаляется только после того, как роутер принял
+        новую: если add отклонен (в том числе большой скрипт в режиме
+        "direct" перед переходом к разделению), рабочий скрипт остается
+        на роутере. Без скрипта роутер остается только между удалением
+        старой версии и переименованием новой (один RTT).
+        
+        Итого - несколько RTT на весь пакет вместо нескольких RTT на файл.
+        Соединение должно быть установлено и авторизовано заранее.
+        
+        Args:
+            scripts (list): Пары (имя скрипта, содержимое)
+            
+        Returns:
+            dict: имя -> True (загружен), False (ошибка) или None
+                  (большой скрипт отклонен роутером при large_upload_mode
+                  "direct" - его следует загрузить через upload_large_script)
+        """
+        scripts = [(name, normalize_newlines(content)) for name, content in scripts]
+        names = [name for name, _ in scripts]
+        staging = {name: f"{name}{self.STAGING_SUFFIX}" for name in names}
+        results = {}
+        
+        print(f"\n📤 Пакетная загрузка {len(scripts)} скриптов")
+        
+        # ═══ ЭТАП 1: ПОИСК СТАРЫХ ВЕРСИЙ (ВСЕ КОПИИ) ═══
+        old_ids = self._resolve_ids('/system/script', names + list(staging.values()))
+        leftovers = [item_id for name in names for item_id in old_ids.get(staging[name], [])]
+        if leftovers:
+            print(f"🧹 Удаление {len(leftovers)} остатков прерванной загрузки")
+            self._apply_to_ids('/system/script/remove', leftovers)
+        
+        # ═══ ЭТАП 2: ДОБАВЛЕНИЕ НОВЫХ ВЕРСИЙ ПОД ВРЕМЕННЫМ ИМЕНЕМ ═══
+        replies = self.execute_pipelined([
+            ['/system/script/add', f'=name={staging[name]}', f'=source={content}',
+             f'=comment={script_fingerprint(content)}', self.SCRIPT_POLICY]
+            for name, content in scripts
+        ])
+        new_ids = {}
+        for (name, content), reply in zip(scripts, replies):
+            trap = next((sentence for sentence in reply if sentence[0] == '!trap'), None)
+            if trap is None:
+                done = reply[-1] if reply else []
+                new_ids[name] = next((word[5:] for word in done if word.startswith('=ret=')), None)
+            elif encoded_size(content) > self.LARGE_SCRIPT_THRESHOLD and self.large_upload_mode == "direct":
+                print(f"⚠️  {name}: роутер отклонил скрипт одной командой")
+                results[name] = None
+            else:
+                print(f"❌ Ошибка {name}: {trap}")
+                results[name] = False
+        
+        # ═══ ЭТАП 3: ЗАМЕНА СТАРЫХ ВЕРСИЙ ═══
+        replaced = [name for name in names if name in new_ids]
+        stale_ids = [item_id for name in replaced for item_id in old_ids.get(name, [])]
+        removed = self._apply_to_ids('/system/script/remove', stale_ids)
+        renames = []
+        for name in replaced:
+            if all(item_id in removed for item_id in old_ids.get(name, [])):
+                renames.append(name)
+            else:
+                print(f"❌ Не удалось удалить старый {name} - новая версия оставлена как {staging[name]}")
+                results[name] = False
+        replies = self.execute_pipelined([
+            ['/system/script/set',
+             f'=.id={new_ids[name]}' if new_ids[name] else f'=numbers={staging[name]}', f'=name={name}']
+            for name in renames
+        ])
+        added = []
+        for name, reply in zip(renames, replies):
+            trap = next((sentence for sentence in reply if sentence[0] == '!trap'), None)
+            if trap is None:
+                added.append(name)
+            else:
+                print(f"❌ Ошибка переименования {staging[name]} → {name}: {trap}")
+                results[name] = False
+        
+        # ═══ ЭТАП 4: ПРОВЕРКА ═══
+        existing = self.verify_scripts_exist(added)
+        for name in added:
+            if name in existing:
+                print(f"✅ {name} загружен")
+                results[name] = True
+            else:
+                print(f"❌ Ошибка: скрипт {name} не найден после загрузки")
+                results[name] = False
+        
+        self.uploaded_count += sum(1 for result in results.values() if result)
+        self.failed_count += sum(1 for result in results.values() if result is False)
+        self._record_deploy([(name, content, 1) for name, content in scripts if results.get(name)])
+        self._record_direct_rejected([name for name in names if name in results and results[name] is None])
+        return results
+    
+    def _clone_connection(self):
+        """
+        Новый загрузчик с теми же параметрами подключения (отдельное соединение).
+        
+        Создается через for_router, как и любой загрузчик роутера;
+        переносится только состояние текущей операции - бюджет времени.
+        """
+        router = RouterConfig(ip=self.router_ip, username=self.username,
+                              password=self.password, port=self.port)
+        clone = type(self).for_router(router)
+        clone.deadline = self.deadline  # Общий бюджет операции для всех соединений
+        return clone
+    
+    def _upload_part(self, temp_script_name, part_content):
+        """
+        Загрузка одной TEMP части на текущем соединении: remove → add.
+        
+        Существование загруженных частей проверяется после загрузки всех
+        частей одним запросом (см. _upload_parts).
+        
+        Отпечаток части записывается в comment - по нему прерванная
+        загрузка продолжается без повторной отправки готовых частей.
+        
+        Raises:
+            Exception: При ошибке загрузки или если часть не найдена после add
+        """
+        # Очистка старых временных скриптов (безопасность)
+        if not self.remove_script(temp_script_name):
+            raise Exception(f"Не удалось очистить старый {temp_script_name}")
+        
+        # Загрузка части как отдельного скрипта
+        replies = self.execute([
+            '/system/script/add',
+            f'=name={temp_script_name}',
+            f'=source={part_content}',
+            f'=comment={script_fingerprint(part_content)}',
+            self.SCRIPT_POLICY
+        ])
+        if not replies or replies[-1][0] != '!done':
+            raise Exception(f"Не получено подтверждение для {temp_script_name}")
+        trap = next((reply for reply in replies if reply[0] == '!trap'), None)
+        if trap:
+            raise Exception(f"Ошибка загрузки {temp_script_name}: {trap}")
+    
+    def _parts_to_upload(self, script_name, parts):
+        """
+        Определение TEMP частей, которые нужно (до)загрузить.
+        
+        Одним запросом print (имена и комментарии скриптов с префиксом
+        имени "<script_name>-TEMP", отобранных на роутере) находим
+        части, оставшиеся от прерванной загрузки. Часть с тем же
+        отпечатком пропускается, части с номером больше len(parts)
+        удаляются одной конвейерной пачкой.
+        
+        Returns:
+            list: Пары (номер части, содержимое) для загрузки
+        """
+        prefix = f"{script_name}-TEMP"
+        remote = {name: fingerprint
+                  for name, fingerprint in self.fetch_script_fingerprints(RouterQuery().prefix('name', prefix)).items()
+                  if name.startswith(prefix) and name[len(prefix):].isdigit()}
+        
+        pending = []
+        for part_index, part_content in enumerate(parts, 1):
+            temp_script_name = f"{prefix}{part_index}"
+            if remote.get(temp_script_name) == script_fingerprint(part_content):
+                print(f"     ♻️  {temp_script_name} уже загружен - пропускаем")
+            else:
+                pending.append((part_index, part_content))
+        
+        # Части от прежнего разбиения с большим количеством частей
+        extra = [name for name in remote if int(name[len(prefix):]) > len(parts)]
+        if extra:
+            print(f"     🧹 Удаление лишних частей: {', '.join(extra)}")
+            self.remove_scripts(extra)
+        
+        if len(pending) < len(parts):
+            print(f"♻️  Продолжение загрузки: отправляется {len(pending)} из {len(parts)} частей")
+        return pending
+    
+    def _upload_parts(self, script_name, parts):
+        """
+        Параллельная загрузка TEMP частей по ограниченному пулу соединений.
+        
+        Каждый поток пула работает со своим соединением (одна авторизация
+        на поток) и загружает очередную часть. Неудачная часть повторяется
+        до PART_UPLOAD_ATTEMPTS раз на новом соединении. Время этапа
+        определяется самой медленной частью, а не суммой всех частей.
+        
+        Одна часть загружается на текущем соединении без пула.
+        
+        Загрузка возобновляемая: список уже имеющихся TEMP частей читается
+        одним запросом, части с совпадающим отпечатком (comment) повторно
+        не отправляются, лишние части от прежнего разбиения удаляются.
+        
+        Args:
+            script_name (str): Имя финального скрипта
+            parts (list): Содержимое частей по порядку
+            
+        Raises:
+            Exception: Если хотя бы одна часть не загружена после всех попыток
+        """
+        pending = self._parts_to_upload(script_name, parts)
+        if not pending:
+            return
+        
+        if len(pending) == 1:
+            part_index, part_content = pending[0]
+            self._upload_part(f"{script_name}-TEMP{part_index}", part_content)
+            print(f"     ✅ {script_name}-TEMP{part_index} успешно загружен")
+        else:
+            self._upload_parts_parallel(script_name, pending)
+        
+        # Проверка всех загруженных частей одним запросом
+        uploaded_names = [f"{script_name}-TEMP{part_index}" for part_index, _ in pending]
+        missing = set(uploaded_names) - self.verify_scripts_exist(uploaded_names)
+        if missing:
+            raise Exception(f"Части не найдены после загрузки: {', '.join(sorted(missing))}")
+    
+    def _upload_parts_parallel(self, script_name, pending):
+        """Загрузка частей (пары номер, содержимое) пулом соединений с повтором."""
+        local = threading.local()  # Соединение каждого потока пула
+        connections = []
+        connections_lock = threading.Lock()
+        
+        def upload(part_index, part_content):
+            temp_script_name = f"{script_name}-TEMP{part_index}"
+            for attempt in range(1, self.PART_UPLOAD_ATTEMPTS + 1):
+                uploader = getattr(local, 'uploader', None)
+                try:
+                    if uploader is None:
+                        uploader = local.uploader = self._clone_connection()
+                        with connections_lock:
+                            connections.append(uploader)
+                    if not uploader.ensure_session():
+                        raise Exception("Ошибка авторизации")
+                    uploader._upload_part(temp_script_name, part_content)
+                    print(f"     ✅ {temp_script_name} ({len(part_content)} байт) успешно загружен")
+                    return
+                except (OperationCancelled, DeadlineExceeded):
+                    # Повтор бесполезен - бюджет операции общий
+                    if uploader is not None:
+                        uploader.close()
+                    raise
+                except Exception as e:
+                    # Состояние соединения неизвестно - следующая попытка на новом
+                    if uploader is not None:
+                        uploader.close()
+                    if attempt == self.PART_UPLOAD_ATTEMPTS:
+                        raise Exception(f"{temp_script_name}: {e}")
+                    print(f"     ⚠️  {temp_script_name}: {e} - повтор {attempt + 1}/{self.PART_UPLOAD_ATTEMPTS}")
+                    self._sleep(self.pacer.part_gap())
+        
+        workers = min(self.PART_UPLOAD_CONNECTIONS, len(pending))
+        print(f"🔀 Параллельная загрузка: {workers} соединений")
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(upload, part_index, part_content)
+                           for part_index, part_content in pending]
+                exceptions = [future.exception() for future in futures if future.exception()]
+                for exception in exceptions:
+                    if isinstance(exception, (OperationCancelled, DeadlineExceeded)):
+                        raise exception
+                errors = [str(exception) for exception in exceptions]
+        finally:
+            for uploader in connections:
+                uploader.close()
+        
+        if errors:
+            raise Exception(f"Не загружены части: {'; '.join(errors)}")
+    
+    def _final_script_current(self, script_name, fingerprint):
+        """
+        Проверка, что на роутере уже новая версия финального скрипта.
+        
+        Combine-скрипт заменяет старую версию сам, поэтому простого
+        наличия скрипта недостаточно - сравнивается отпечаток в comment.
+        
+        Returns:
+            bool: True если отпечаток скрипта совпадает с загружаемым
+        """
+        query = RouterQuery().equal('name', script_name)
+        return self.fetch_script_fingerprints(query).get(script_name) == fingerprint
+    
+    def _combine_now(self, script_name, combine_script_name, fingerprint):
+        """
+        Немедленное объединение частей: /system/script/run combine-скрипта.
+        
+        Команда run возвращает !done после завершения скрипта, поэтому
+        не нужны чтение часов роутера, планировщик с запасом времени
+        и ожидание его срабатывания.
+        
+        Args:
+            script_name (str): Имя финального скрипта
+            combine_script_name (str): Имя combine-скрипта
+            fingerprint (str): Отпечаток содержимого финального скрипта
+        
+        Returns:
+            bool: True - финальный скрипт создан, combine-скрипт удален
+            None: Роутер отклонил run (!trap) - нужен резервный путь
+            
+        Raises:
+            Exception: combine выполнен, но финальный скрипт не появился
+        """
+        print(f"▶️  Запуск {combine_script_name} через /system/script/run")
+        started = time.monotonic()
+        replies = self.execute(['/system/script/run', f'=number={combine_script_name}'])
+        trap = next((reply for reply in replies if reply[0] == '!trap'), None)
+        if trap or not replies or replies[-1][0] != '!done':
+            print(f"⚠️  Запуск через API недоступен ({trap}) - используем планировщик")
+            return None
+        
+        if not self._final_script_current(script_name, fingerprint):
+            raise Exception(f"{combine_script_name} выполнен, но скрипт {script_name} не обновлен")
+        print(f"✅ Финальный скрипт создан через {time.monotonic() - started:.1f} секунд!")
+        
+        # Combine-скрипт больше не нужен (в пути планировщика его удаляет сам планировщик)
+        if not self.remove_script(combine_script_name):
+            print(f"⚠️  Не удалось удалить {combine_script_name}")
+        return True
+    
+    def _combine_via_scheduler(self, script_name, combine_script_name, last_part_name, fingerprint):
+        """
+        Объединение частей через однократный планировщик (резервный путь).
+        
+        Планировщик запускается по часам роутера с запасом
+        (get_mikrotik_time), выполняет combine, затем удаляет
+        combine-скрипт и самого себя.
+        
+        Старая версия финального скрипта остается на роутере до
+        срабатывания combine, поэтому завершение определяется по
+        удалению последней TEMP части (combine удаляет части только
+        после создания финального скрипта) и сверке отпечатка.
+        
+        Args:
+            script_name (str): Имя финального скрипта
+            combine_script_name (str): Имя combine-скрипта
+            last_part_name (str): Имя последней TEMP части
+            fingerprint (str): Отпечаток содержимого финального скрипта
+        
+        Raises:
+            Exception: При ошибке создания планировщика или таймауте
+        """
+        # Получаем системное время роутера для точного планирования
+        execution_time = self.get_mikrotik_time()
+        if not execution_time:
+            raise Exception("Не удалось получить системное время роутера")
+        
+        scheduler_name = f"run-{script_name}-combine"
+        print(f"⏰ Создание планировщика {scheduler_name} на время {execution_time}")
+        
+        # Очистка старого планировщика
+        if not self.remove_scheduler(scheduler_name):
+            raise Exception(f"Не удалось очистить старый планировщик {scheduler_name}")
+        
+        # Команда планировщика (многоэтапная):
+        # 1. Запуск combine-скрипта
+        # 2. Пауза 2 секунды для завершения
+        # 3. Удаление combine-скрипта (самоочистка)
+        # 4. Удаление самого планировщика (самоуничтожение)
+        scheduler_command = (
+            f"/system script run {combine_script_name}; "
+            f":delay 2s; "
+            f"/system script remove {combine_script_name}; "
+            f"/system scheduler remove {scheduler_name}"
+        )
+        
+        print(f"📋 Команда планировщика: {scheduler_command}")
+        
+        # Создание планировщика
+        self.write_sentence([
+            '/system/scheduler/add',
+            f'=name={scheduler_name}',
+            f'=on-event={scheduler_command}',
+            f'=start-time={execution_time}',
+            '=interval=0s',  # Однократное выполнение
+            '=policy=read,write,policy,test,sensitive,ftp,reboot,password,sniff,romon'
+        ])
+        
+        # Ожидание подтверждения создания планировщика
+        scheduler_created = False
+        while True:
+            reply = self.read_sentence()
+            if not reply:
+                break
+            if reply[0] == '!done':
+                scheduler_created = True
+                break
+            elif reply[0] == '!trap':
+                raise Exception(f"Ошибка создания планировщика: {reply}")
+        
+        if not scheduler_created:
+            raise Exception("Не получено подтверждение создания планировщика")
+        
+        # Умное ожидание выполнения
+        print(f"⏳ Ожидание автоматического объединения...")
+        print(f"   Планировщик запустится в {execution_time}")
+        print(f"   Максимальное время ожидания: 60 секунд")
+        
+        # Ждем удаления последней TEMP части через listen
+        # (или опросом с нарастающей паузой, если listen недоступен)
+        started = time.monotonic()
+        combined = self.wait_for_script(last_part_name, present=False, timeout=60.0)
+        if not combined:
+            raise Exception(f"Таймаут ожидания создания скрипта {script_name} (60 секунд)")
+        
+        if not self._final_script_current(script_name, fingerprint):
+            raise Exception(f"Combine выполнен, но скрипт {script_name} не обновлен")
+        print(f"✅ Финальный скрипт создан через {time.monotonic() - started:.1f} секунд!")
+    
+    def upload_large_script(self, script_name, content):
         """
         ═══════════════════════════════════════════════════════════════════
                     ЗАГРУЗКА БОЛЬШИХ СКРИПТОВ (>15KB)
@@ -734,29 +2519,32 @@ class MikrotikUploader:
         Сложный метод для обхода ограничений RouterOS API на размер команды.
         
         ПРОБЛЕМА:
-        RouterOS API ограничивает размер одной команды примерно 16KB.
-        Попытка загрузить больший скрипт приводит к ошибке передачи.
+        Слово длиннее 16KB требует 3-5 байтового заголовка длины. Если роутер
+        отклоняет такую команду (или выбран large_upload_mode = "split"),
+        скрипт загружается частями.
         
         РЕШЕНИЕ - АРХИТЕКТУРА РАЗДЕЛЕНИЯ:
         ┌─────────────────────────────────────────────────────────────────┐
         │ 1. РАЗДЕЛЕНИЕ    │ Файл → части по 15KB                       │
         │ 2. ЗАГРУЗКА      │ Части → временные скрипты (-TEMP1, -TEMP2) │
+        │                  │ (параллельно, до 4 соединений, с повтором) │
         │ 3. ОБЪЕДИНИТЕЛЬ  │ Создание combine-скрипта                   │
-        │ 4. ПЛАНИРОВЩИК   │ Scheduler для отложенного выполнения       │
+        │ 4. ЗАПУСК        │ /system/script/run (scheduler - резерв)    │
         │ 5. ОБЪЕДИНЕНИЕ   │ Combine создает финальный скрипт           │
         │ 6. ОЧИСТКА       │ Удаление временных файлов и планировщика   │
         └─────────────────────────────────────────────────────────────────┘
         
-        ПОЧЕМУ НУЖЕН SCHEDULER:
-        - API команды выполняются синхронно в контексте подключения
-        - Combine-скрипт должен выполниться независимо от API сессии
-        - Scheduler обеспечивает асинхронное выполнение в нужное время
+        ЗАПУСК ОБЪЕДИНЕНИЯ (combine_mode):
+        - "run": combine выполняется сразу командой /system/script/run,
+          !done приходит после завершения скрипта - без ожидания часов
+        - Если роутер отклонил run, или combine_mode = "scheduler" -
+          однократный scheduler запускает combine через несколько секунд
         
         СХЕМА ИМЕНОВАНИЯ:
         • Основной файл: "MyScript"
         • Временные части: "MyScript-TEMP1", "MyScript-TEMP2", ...
         • Объединяющий скрипт: "MyScript-Combine"
-        • Планировщик: "run-MyScript-combine"
+        • Планировщик (резервный путь): "run-MyScript-combine"
         
         Args:
             script_name (str): Имя итогового скрипта
@@ -775,70 +2563,26 @@ class MikrotikUploader:
         
         try:
             # ═══ ЭТАП 1: ПОДГОТОВКА СОЕДИНЕНИЯ ═══
-            # Создаем отдельное подключение для всей операции
-            # Это обеспечивает изоляцию от других операций
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(60)
-            sock.connect((self.router_ip, self.port))
-            self.sock = sock
-            
-            if not self.login():
+            # Используем сессию из пула или создаем подключение для всей операции
+            if not self.ensure_session():
                 return False
             
             # ═══ ЭТАП 2: РАЗДЕЛЕНИЕ НА ЧАСТИ ═══
-            parts = []
-            chunk_size = 15000  # Безопасный размер части (меньше лимита API)
-            
-            # Разделяем содержимое на равные части
-            for start_pos in range(0, len(content), chunk_size):
-                end_pos = start_pos + chunk_size
-                part_content = content[start_pos:end_pos]
-                parts.append(part_content)
-            
-            print(f"📑 Файл разделен на {len(parts)} частей по {chunk_size} байт")
+            # Части максимального размера по байтам на проводе, разрезы по границам строк
+            parts = plan_script_chunks(content)
+            part_sizes = [len(encode_word(part)) for part in parts]
+            print(f"📑 Файл разделен на {len(parts)} частей (до {MAX_PART_BYTES} байт): "
+                  f"{', '.join(map(str, part_sizes))}")
             
             # ═══ ЭТАП 3: ЗАГРУЗКА ВРЕМЕННЫХ ЧАСТЕЙ ═══
             print(f"📤 Начинаем загрузку {len(parts)} временных частей...")
             
-            for part_index, part_content in enumerate(parts, 1):
-                temp_script_name = f"{script_name}-TEMP{part_index}"
-                print(f"\n  📋 Часть {part_index}/{len(parts)}: {temp_script_name}")
-                print(f"     Размер: {len(part_content)} байт")
-                
-                # Очистка старых временных скриптов (безопасность)
-                if not self.remove_script(temp_script_name):
-                    raise Exception(f"Не удалось очистить старый {temp_script_name}")
-                
-                # Загрузка части как отдельного скрипта
-                self.write_sentence([
-                    '/system/script/add',
-                    f'=name={temp_script_name}',
-                    f'=source={part_content}',
-                    '=policy=read,write,policy,test,sensitive,ftp,reboot,password,sniff,romon'
-                ])
-                
-                # Ожидание подтверждения загрузки
-                upload_success = False
-                while True:
-                    reply = self.read_sentence()
-                    if not reply:
-                        break
-                    if reply[0] == '!done':
-                        upload_success = True
-                        break
-                    elif reply[0] == '!trap':
-                        raise Exception(f"Ошибка загрузки части {part_index}: {reply}")
-                
-                if not upload_success:
-                    raise Exception(f"Не получено подтверждение для части {part_index}")
-                
-                # Проверка успешности создания части
-                if not self.verify_script_exists(temp_script_name):
-                    raise Exception(f"Часть {temp_script_name} не найдена после загрузки")
-                
-                print(f"     ✅ {temp_script_name} успешно загружен")
-                time.sleep(0.5)  # Краткая пауза между частями для стабильности
-                
+            # Части загружаются параллельно по нескольким соединениям -
+            # combine запускается только после подтверждения всех частей
+            with self._phase(f"загрузка частей {script_name}"):
+                self._upload_parts(script_name, parts)
+            print(f"✅ Все {len(parts)} частей загружены и подтверждены")
+            
             # ═══ ЭТАП 4: СОЗДАНИЕ ОБЪЕДИНЯЮЩЕГО СКРИПТА ═══
             print(f"\n🔄 Создание объединяющего скрипта...")
             
@@ -871,8 +2615,10 @@ class MikrotikUploader:
             # Добавляем создание финального скрипта
             combine_script_code += f"""
 # === СОЗДАНИЕ ФИНАЛЬНОГО СКРИПТА ===
+# Старая версия удаляется только когда новое содержимое уже собрано
 :log info "Создаем финальный скрипт: {script_name}"
-/system script add name="{script_name}" source=$finalContent policy=read,write,policy,test,sensitive,ftp,reboot,password,sniff,romon
+/system script remove [find name="{script_name}"]
+/system script add name="{script_name}" comment="{script_fingerprint(content)}" source=$finalContent policy=read,write,policy,test,sensitive,ftp,reboot,password,sniff,romon
 :log info "Финальный скрипт {script_name} создан успешно"
 
 # === ОЧИСТКА ВРЕМЕННЫХ ФАЙЛОВ ===
@@ -900,7 +2646,8 @@ class MikrotikUploader:
             combine_script_name = f"{script_name}-Combine"
             print(f"\n📤 Загрузка объединяющего скрипта: {combine_script_name}")
             
-            # Очистка старого combine-скрипта
+            # Очистка старого combine-скрипта (старую версию финального
+            # скрипта заменяет сам combine, когда части уже собраны)
             if not self.remove_script(combine_script_name):
                 raise Exception(f"Не удалось очистить старый {combine_script_name}")
             
@@ -933,160 +2680,1024 @@ class MikrotikUploader:
             
             print(f"✅ {combine_script_name} успешно загружен")
             
-            # ═══ ЭТАП 6: СОЗДАНИЕ ПЛАНИРОВЩИКА ═══
-            # Получаем системное время роутера для точного планирования
-            execution_time = self.get_mikrotik_time()
-            if not execution_time:
-                raise Exception("Не удалось получить системное время роутера")
+            # ═══ ЭТАП 6-7: ОБЪЕДИНЕНИЕ ═══
+            # Сразу через /system/script/run; планировщик - только резервный путь
+            fingerprint = script_fingerprint(content)
+            used_scheduler = False
+            script_created = None
+            with self._phase(f"объединение {script_name}"):
+                if self.combine_mode == "run":
+                    script_created = self._combine_now(script_name, combine_script_name, fingerprint)
+                if script_created is None:
+                    used_scheduler = True
+                    self._combine_via_scheduler(script_name, combine_script_name,
+                                                f"{script_name}-TEMP{len(parts)}", fingerprint)
+            
+            # ═══ ЭТАП 8: ДИАГНОСТИКА ОЧИСТКИ ═══
+            print(f"🔍 Диагностика очистки временных объектов:")
+            
+            # Все временные объекты (и планировщик) проверяем за один RTT
+            temp_names = [f"{script_name}-TEMP{part_num}" for part_num in range(1, len(parts) + 1)]
+            combine_name = f"{script_name}-Combine"
+            scheduler_name = f"run-{script_name}-combine"
+            script_commands = self._exists_commands('/system/script', temp_names + [combine_name])
+            scheduler_commands = (self._exists_commands('/system/scheduler', [scheduler_name])
+                                  if used_scheduler else [])
+            replies = self.execute_pipelined(script_commands + scheduler_commands)
+            remaining_scripts = self._names_in_replies(replies[:len(script_commands)])
+            remaining_schedulers = self._names_in_replies(replies[len(script_commands):])
+            
+            # Проверяем что временные объекты удалены планировщиком
+            for temp_name in temp_names:
+                if temp_name in remaining_scripts:
+                    print(f"   ⚠️  Временный скрипт {temp_name} ещё существует")
+                else:
+                    print(f"   ✅ Временный скрипт {temp_name} удален")
+            
+            if combine_name in remaining_scripts:
+                print(f"   ⚠️  Combine-скрипт {combine_name} ещё существует")
+            else:
+                print(f"   ✅ Combine-скрипт {combine_name} удален")
+                
+            if used_scheduler:
+                if scheduler_name in remaining_schedulers:
+                    print(f"   ⚠️  Планировщик {scheduler_name} ещё существует")
+                else:
+                    print(f"   ✅ Планировщик {scheduler_name} удален")
+            
+            print(f"✅ Большой скрипт {script_name} успешно загружен и объединен!")
+            print(f"📊 Статистика: {len(parts)} частей → 1 финальный скрипт")
+            
+            self.uploaded_count += 1
+            self._record_deploy([(script_name, content, len(parts))])
+            return True
+            
+        except (OperationCancelled, DeadlineExceeded) as error:
+            print(f"❌ Загрузка большого файла прервана: {error}")
+            print(f"♻️  Загруженные части будут использованы при повторной загрузке")
+            self.failed_count += 1
+            self.close()
+            raise
+        except Exception as error:
+            print(f"❌ Критическая ошибка при загрузке большого файла:")
+            print(f"   {error}")
+            print(f"🧹 Рекомендуется ручная очистка временных объектов")
+            self.failed_count += 1
+            # Состояние соединения после ошибки неизвестно - не используем его повторно
+            self.close()
+            return False
+        finally:
+            # ═══ ОЧИСТКА РЕСУРСОВ ═══
+            if not self.keep_alive:
+                self.close()
+            # Пауза для стабилизации системы после сложной операции
+            self._sleep(self.pacer.settle_delay(), strict=False)
+
+class RouterConfig:
+    """Конфигурация роутера для подключения."""
+    def __init__(self, name="", ip="", username="", password="", port=8728):
+        self.name = name
+        self.ip = ip
+        self.username = username
+        self.password = password
+        self.port = port
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'ip': self.ip,
+            'username': self.username,
+            'password': self.password,
+            'port': self.port
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get('name', ''),
+            data.get('ip', ''),
+            data.get('username', ''),
+            data.get('password', ''),
+            data.get('port', 8728)
+        )
+    
+    def session_key(self):
+        """Ключ для пула сессий: параметры, определяющие соединение."""
+        return (self.ip, self.port, self.username, self.password)
+    
+    def manifest_key(self):
+        """Ключ роутера в манифесте загрузок (без учетных данных)."""
+        return DeployManifest.router_key(self.ip, self.port)
+
+
+class DeployManifest:
+    """
+    Локальный манифест загрузок: что и когда было загружено на каждый роутер.
+    
+    Файл deploy_manifest.json хранится рядом с uploader_settings.json:
+    {
+      "10.10.55.1:8728": {
+        "scripts": {
+          "Module": {"hash": "sha256:...", "size": 1234, "parts": 1,
+                     "direct_rejected": false,
+                     "deployed_at": "2024-01-01 12:00:00"}
+        }
+      }
+    }
+    
+    Манифест позволяет:
+    - показывать неизмененные файлы без запросов к роутеру
+    - сразу выбирать разделение на части, если роутер уже отклонял
+      загрузку скрипта одной командой (direct_rejected)
+    
+    Решение о пропуске неизмененных скриптов принимается только по
+    отпечаткам с роутера: манифест может устареть, если скрипт изменили
+    на роутере вручную. При каждой сверке записи о несовпавших скриптах
+    удаляются (reconcile).
+    
+    Запись атомарная (временный файл + os.replace), доступ из потоков
+    загрузки и интерфейса защищен блокировкой.
+    """
+    
+    FILE_NAME = "deploy_manifest.json"
+    
+    def __init__(self, path=None):
+        if path is None:
+            module_dir = os.path.dirname(os.path.abspath(__file__))
+            path = os.path.join(module_dir, self.FILE_NAME)
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        self.load()
+    
+    @staticmethod
+    def router_key(ip, port):
+        """Ключ роутера в манифесте."""
+        return f"{ip}:{port}"
+    
+    def load(self):
+        """Загрузка манифеста с диска (поврежденный файл игнорируется)."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        with self._lock:
+            self._data = data if isinstance(data, dict) else {}
+    
+    def _save(self):
+        """Атомарная запись манифеста (вызывается под блокировкой)."""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+    
+    def _router_state(self, router_key):
+        return self._data.setdefault(router_key, {"scripts": {}})
+    
+    def get(self, router_key, script_name):
+        """Запись о последней загрузке скрипта (dict) или None."""
+        with self._lock:
+            entry = self._data.get(router_key, {}).get("scripts", {}).get(script_name)
+            return dict(entry) if entry else None
+    
+    def is_current(self, router_key, script_name, fingerprint):
+        """True если на роутер загружена именно эта версия скрипта."""
+        entry = self.get(router_key, script_name)
+        return bool(entry) and entry.get("hash") == fingerprint
+    
+    def is_direct_rejected(self, router_key, script_name):
+        """True если роутер отклонял загрузку этого скрипта одной командой."""
+        entry = self.get(router_key, script_name)
+        return bool(entry) and entry.get("direct_rejected", False)
+    
+    def mark_direct_rejected(self, router_key, script_names):
+        """
+        Учет скриптов, загрузку которых одной командой роутер отклонил (!trap).
+        
+        Отметка сохраняется при последующих загрузках частями и снимается
+        после успешной загрузки одной командой.
+        """
+        if not script_names:
+            return
+        with self._lock:
+            scripts = self._router_state(router_key)["scripts"]
+            for script_name in script_names:
+                scripts.setdefault(script_name, {})["direct_rejected"] = True
+            self._save()
+    
+    def record(self, router_key, deployed):
+        """
+        Учет успешно загруженных скриптов.
+        
+        Args:
+            router_key (str): Ключ роутера (router_key)
+            deployed (list): Тройки (имя, содержимое, количество частей)
+        """
+        if not deployed:
+            return
+        deployed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            scripts = self._router_state(router_key)["scripts"]
+            for script_name, content, parts in deployed:
+                rejected = parts > 1 and scripts.get(script_name, {}).get("direct_rejected", False)
+                scripts[script_name] = {
+                    "hash": script_fingerprint(content),
+                    "size": encoded_size(content),
+                    "parts": parts,
+                    "direct_rejected": rejected,
+                    "deployed_at": deployed_at
+                }
+            self._save()
+    
+    def reconcile(self, router_key, names, remote_fingerprints):
+        """
+        Сверка записей манифеста с отпечатками скриптов роутера.
+        
+        Записи о скриптах, которых нет на роутере или чей отпечаток в
+        комментарии не совпадает, удаляются - такие скрипты будут
+        загружены заново. Отметка direct_rejected при этом сохраняется.
+        
+        Args:
+            router_key (str): Ключ роутера (router_key)
+            names (list): Имена сверяемых скриптов
+            remote_fingerprints (dict): имя -> отпечаток с роутера
+                (результат MikrotikUploader.fetch_script_fingerprints)
+        
+        Returns:
+            int: Количество удаленных устаревших записей
+        """
+        with self._lock:
+            scripts = self._router_state(router_key)["scripts"]
+            stale = [name for name in names
+                     if name in scripts and remote_fingerprints.get(name) != scripts[name].get("hash")]
+            for name in stale:
+                if scripts[name].get("direct_rejected"):
+                    scripts[name] = {"direct_rejected": True}  # Отказ роутера остается в силе
+                else:
+                    del scripts[name]
+            if stale:
+                self._save()
+            return len(stale)
+
+
+class SettingsStore:
+    """
+    Настройки приложения в памяти с отложенной атомарной записью на диск.
+    
+    Файл uploader_settings.json хранится рядом с модулем. update() только
+    заменяет снимок настроек в памяти и перезапускает таймер: серия
+    изменений (переключатели, интервал, выбор роутера) за DEBOUNCE секунд
+    записывается одним разом в фоновом потоке таймера. Обработчики
+    интерфейса не ждут диск.
+    
+    Запись атомарная (временный файл + fsync + os.replace): при аварийном
+    завершении на диске остается либо прежний, либо новый файл целиком.
+    flush() записывает немедленно - вызывается при закрытии приложения.
+    """
+    
+    FILE_NAME = "uploader_settings.json"
+    DEBOUNCE = 1.0  # Пауза после последнего изменения до записи (сек)
+    
+    def __init__(self, path=None, debounce=DEBOUNCE, on_error=None):
+        """
+        Args:
+            path (str): путь к файлу настроек (по умолчанию рядом с модулем)
+            debounce (float): пауза после последнего изменения до записи (сек)
+            on_error (callable): обработчик ошибки фоновой записи (исключение)
+        """
+        if path is None:
+            module_dir = os.path.dirname(os.path.abspath(__file__))
+            path = os.path.join(module_dir, self.FILE_NAME)
+        self.path = path
+        self.debounce = debounce
+        self.on_error = on_error
+        self._lock = threading.Lock()        # Снимок, версии и таймер
+        self._write_lock = threading.Lock()  # Одна запись файла одновременно
+        self._data = {}
+        self._version = 0   # Версия снимка в памяти
+        self._written = 0   # Версия, записанная на диск
+        self._timer = None
+    
+    def load(self):
+        """
+        Чтение настроек с диска.
+        
+        Returns:
+            dict: настройки (пустой словарь если файла нет)
+        
+        Raises:
+            OSError, ValueError: файл недоступен или поврежден
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        if not isinstance(data, dict):
+            raise ValueError("файл настроек не содержит объект JSON")
+        with self._lock:
+            self._data = data
+        return dict(data)
+    
+    def update(self, settings):
+        """
+        Замена снимка настроек и планирование записи.
+        
+        Returns:
+            bool: True если настройки изменились и запись запланирована
+        """
+        with self._lock:
+            if settings == self._data:
+                return False
+            self._data = dict(settings)
+            self._version += 1
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._write_pending)
+            self._timer.daemon = True
+            self._timer.start()
+            return True
+    
+    def pending(self):
+        """True если в памяти есть незаписанные изменения."""
+        with self._lock:
+            return self._version != self._written
+    
+    def flush(self):
+        """Немедленная запись незаписанных изменений (в вызывающем потоке)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._write()
+    
+    def _write_pending(self):
+        """Запись по таймеру (фоновый поток); ошибка передается в on_error."""
+        try:
+            self._write()
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e)
+    
+    def _write(self):
+        """Атомарная запись последнего снимка, если он еще не записан."""
+        with self._write_lock:
+            with self._lock:
+                if self._version == self._written:
+                    return
+                data, version = self._data, self._version
+            
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            
+            with self._lock:
+                self._written = version
+
+
+class RouterSessionPool:
+    """
+    Пул авторизованных API сессий по роутерам.
+    
+    Вместо подключения и /login на каждую операцию рабочие потоки берут
+    готовую сессию из пула и возвращают ее после работы:
+    
+        with pool.session(router, deadline=Deadline(3.0)) as uploader:
+            uploader.execute(['/system/script/print', '=.proplist=name'])
+    
+    - Сессии хранятся по RouterConfig.session_key()
+    - Каждая сессия выдается только одному потоку одновременно
+    - Сессия, простаивавшая дольше health_check_after, перед выдачей
+      проверяется легкой командой; мертвая сессия заменяется новой
+    - Сессия, в которой произошло исключение, закрывается, а не
+      возвращается в пул (состояние протокола неизвестно)
+    - Бюджет времени операции (Deadline) действует на все вызовы сокета
+      сессии, включая подключение, вход и проверку перед выдачей
+    """
+    
+    def __init__(self, max_idle_per_router=2, health_check_after=15.0):
+        """
+        Args:
+            max_idle_per_router (int): Максимум простаивающих сессий на роутер
+            health_check_after (float): Простой (сек), после которого сессия
+                проверяется перед выдачей
+        """
+        self.max_idle_per_router = max_idle_per_router
+        self.health_check_after = health_check_after
+        self._lock = threading.Lock()
+        self._idle = {}  # ключ роутера -> список (uploader, время возврата)
+    
+    def _is_healthy(self, uploader):
+        """Проверка сессии легкой командой с коротким таймаутом."""
+        try:
+            uploader.sock.settimeout(2.0)
+            replies = uploader.execute(['/system/identity/print'])
+            return bool(replies) and replies[-1][0] == '!done'
+        except Exception:
+            return False
+        finally:
+            if uploader.sock:
+                uploader.sock.settimeout(uploader.SOCKET_TIMEOUT)
+    
+    def acquire(self, router, deadline=None):
+        """
+        Получение авторизованной сессии для роутера.
+        
+        Таймауты сокета задает сама сессия: по бюджету deadline, а без
+        него - SOCKET_TIMEOUT.
+        
+        Args:
+            router (RouterConfig): Роутер
+            deadline (Deadline): Общий бюджет времени операции
             
-            scheduler_name = f"run-{script_name}-combine"
-            print(f"⏰ Создание планировщика {scheduler_name} на время {execution_time}")
-            
-            # Очистка старого планировщика
-            if not self.remove_scheduler(scheduler_name):
-                raise Exception(f"Не удалось очистить старый планировщик {scheduler_name}")
-            
-            # Команда планировщика (многоэтапная):
-            # 1. Запуск combine-скрипта
-            # 2. Пауза 2 секунды для завершения
-            # 3. Удаление combine-скрипта (самоочистка)
-            # 4. Удаление самого планировщика (самоуничтожение)
-            scheduler_command = (
-                f"/system script run {script_name}-Combine; "
-                f":delay 2s; "
-                f"/system script remove {script_name}-Combine; "
-                f"/system scheduler remove {scheduler_name}"
-            )
-            
-            print(f"📋 Команда планировщика: {scheduler_command}")
-            
-            # Создание планировщика
-            self.write_sentence([
-                '/system/scheduler/add',
-                f'=name={scheduler_name}',
-                f'=on-event={scheduler_command}',
-                f'=start-time={execution_time}',
-                '=interval=0s',  # Однократное выполнение
-                '=policy=read,write,policy,test,sensitive,ftp,reboot,password,sniff,romon'
-            ])
+        Returns:
+            MikrotikUploader: Сессия с keep_alive=True
             
-            # Ожидание подтверждения создания планировщика
-            scheduler_created = False
-            while True:
-                reply = self.read_sentence()
-                if not reply:
-                    break
-                if reply[0] == '!done':
-                    scheduler_created = True
+        Raises:
+            Exception: При ошибке подключения или авторизации
+        """
+        key = router.session_key()
+        uploader = None
+        
+        while uploader is None:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
                     break
-                elif reply[0] == '!trap':
-                    raise Exception(f"Ошибка создания планировщика: {reply}")
+                uploader, released_at = idle.pop()
             
-            if not scheduler_created:
-                raise Exception("Не получено подтверждение создания планировщика")
+            uploader.deadline = deadline
+            if not uploader.sock or not uploader.logged_in:
+                uploader = None
+            elif (time.time() - released_at > self.health_check_after and
+                  not self._is_healthy(uploader)):
+                uploader.close()
+                uploader = None
+        
+        if uploader is None:
+            uploader = MikrotikUploader.for_router(router)
+            uploader.keep_alive = True
+            uploader.deadline = deadline
+            try:
+                if not uploader.ensure_session():
+                    raise Exception("Ошибка авторизации")
+            except BaseException:
+                uploader.close()
+                raise
+        
+        return uploader
+    
+    def release(self, uploader, discard=False):
+        """
+        Возврат сессии в пул.
+        
+        Args:
+            uploader (MikrotikUploader): Сессия, полученная через acquire
+            discard (bool): Закрыть сессию вместо возврата в пул
+        """
+        uploader.deadline = None  # Бюджет относился к завершенной операции
+        if (discard or not uploader.sock or not uploader.logged_in or
+                uploader.has_pending_data()):
+            uploader.close()
+            return
+        
+        key = (uploader.router_ip, uploader.port, uploader.username, uploader.password)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_router:
+                idle.append((uploader, time.time()))
+                return
+        uploader.close()
+    
+    @contextmanager
+    def session(self, router, deadline=None):
+        """Контекстный менеджер: acquire + release (с закрытием при исключении)."""
+        uploader = self.acquire(router, deadline)
+        try:
+            yield uploader
+        except BaseException:
+            self.release(uploader, discard=True)
+            raise
+        else:
+            self.release(uploader)
+    
+    def close_all(self):
+        """Закрытие всех простаивающих сессий (при выходе из приложения)."""
+        with self._lock:
+            sessions = [uploader for idle in self._idle.values() for uploader, _ in idle]
+            self._idle.clear()
+        for uploader in sessions:
+            uploader.close()
+
+class RefreshCoordinator:
+    """
+    Обновления содержимого роутеров: не больше одного одновременно на роутер.
+    
+    - request запускает обновление в отдельном потоке, если для этого
+      роутера ничего не выполняется
+    - Запросы, пришедшие во время выполнения, объединяются в одно
+      повторное обновление сразу после текущего (подробное, если
+      подробным был хотя бы один из них)
+    - После неудачи следующие плановые запросы (force=False, таймер
+      автообновления) пропускаются с экспоненциально растущей паузой;
+      явные запросы (кнопки, обновление после действий) выполняются сразу
+    """
+    
+    def __init__(self, backoff_base=3.0, backoff_max=60.0, on_error=None):
+        """
+        Args:
+            backoff_base (float): Пауза после первой неудачи (сек)
+            backoff_max (float): Наибольшая пауза (сек)
+            on_error (callable): on_error(key, исключение) - исключение,
+                выброшенное обновлением (считается неудачей)
+        """
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._state = {}  # ключ роутера -> состояние обновлений
+    
+    def request(self, key, job, verbose=False, force=True):
+        """
+        Запрос обновления.
+        
+        Args:
+            key: Ключ роутера (RouterConfig.session_key())
+            job (callable): job(verbose) -> bool, выполняется в отдельном потоке
+            verbose (bool): Подробное обновление (с журналом)
+            force (bool): Выполнить, даже если действует пауза после неудач
             
-            # ═══ ЭТАП 7: УМНОЕ ОЖИДАНИЕ ВЫПОЛНЕНИЯ ═══
-            print(f"⏳ Ожидание автоматического объединения...")
-            print(f"   Планировщик запустится в {execution_time}")
-            print(f"   Максимальное время ожидания: 60 секунд")
+        Returns:
+            str: "started" - запущено, "merged" - объединено с выполняющимся,
+                 "backoff" - пропущено из-за паузы после неудач
+        """
+        with self._lock:
+            state = self._state.setdefault(key, {
+                "running": False, "follow_up": False, "follow_up_verbose": False,
+                "follow_up_force": False, "failures": 0, "retry_at": 0.0})
+            if state["running"]:
+                state["follow_up"] = True
+                state["follow_up_verbose"] |= verbose
+                state["follow_up_force"] |= force
+                return "merged"
+            if not force and time.monotonic() < state["retry_at"]:
+                return "backoff"
+            state["running"] = True
+        threading.Thread(target=self._run, args=(key, job, verbose), daemon=True).start()
+        return "started"
+    
+    def failures(self, key):
+        """Количество неудачных обновлений подряд для роутера."""
+        with self._lock:
+            return self._state.get(key, {}).get("failures", 0)
+    
+    def _run(self, key, job, verbose):
+        """Выполнение обновления и объединенных повторов."""
+        while True:
+            try:
+                succeeded = bool(job(verbose))
+            except Exception as e:
+                succeeded = False
+                if self.on_error:
+                    self.on_error(key, e)
             
-            # Активная проверка создания финального скрипта
-            script_created = False
-            for attempt in range(60):  # Максимум 60 попыток = 60 секунд
-                time.sleep(1)  # Пауза 1 секунда между проверками
+            with self._lock:
+                state = self._state[key]
+                if succeeded:
+                    state["failures"] = 0
+                    state["retry_at"] = 0.0
+                else:
+                    state["failures"] += 1
+                    pause = min(self.backoff_base * 2 ** (state["failures"] - 1), self.backoff_max)
+                    state["retry_at"] = time.monotonic() + pause
                 
-                # Переподключаемся для получения свежих данных
-                if not self.reconnect_for_fresh_data():
-                    print(f"❌ Ошибка переподключения на попытке {attempt + 1}")
+                run_again = state["follow_up"] and (
+                    state["follow_up_force"] or time.monotonic() >= state["retry_at"])
+                verbose = state["follow_up_verbose"]
+                state["follow_up"] = state["follow_up_verbose"] = state["follow_up_force"] = False
+                if not run_again:
+                    state["running"] = False
+                    return
+
+class RouterOSTrapError(Exception):
+    """Ошибка выполнения команды API (ответ !trap)."""
+    
+    def __init__(self, command, reply):
+        self.command = command
+        self.reply = reply
+        message = next((word[9:] for word in reply if word.startswith('=message=')), str(reply))
+        super().__init__(f"{command}: {message}")
+
+class AsyncRouterOSClient:
+    """
+    Асинхронный клиент RouterOS API на asyncio.
+    
+    В отличие от MikrotikUploader (блокирующий сокет в отдельном потоке на
+    каждую операцию), клиент работает внутри цикла событий:
+    - соединение открывается через asyncio.open_connection
+    - каждая команда получает .tag=, поэтому на одном соединении можно
+      выполнять сколько угодно команд одновременно
+    - фоновая задача читает ответы и раздает их ожидающим командам по тегу
+    - таймаут или отмена команды отправляют роутеру /cancel для ее тега
+    
+    Один процесс может так управлять множеством роутеров без потока
+    на каждую операцию (см. run_on_routers).
+    
+    Пример:
+        async with AsyncRouterOSClient.from_router(router) as client:
+            scripts, clock = await asyncio.gather(
+                client.print('/system/script', proplist=['name', 'run-count']),
+                client.get_clock())
+    """
+    
+    def __init__(self, router_ip, username, password, port=8728, timeout=10.0):
+        """
+        Args:
+            router_ip (str): IP адрес роутера
+            username (str): Имя пользователя API
+            password (str): Пароль
+            port (int): Порт API (8728)
+            timeout (float): Таймаут подключения и команд по умолчанию (сек)
+        """
+        self.router_ip = router_ip
+        self.username = username
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        
+        self.reader = None
+        self.writer = None
+        self._reader_task = None
+        self._pending = {}    # тег -> (список предложений ответа, future)
+        self._next_tag = 0
+        self._lost = None     # Ошибка, с которой оборвалось соединение (или None)
+        
+    @classmethod
+    def from_router(cls, router, **kwargs):
+        """Создание клиента по конфигурации роутера (RouterConfig)."""
+        return cls(router.ip, router.username, router.password, router.port, **kwargs)
+    
+    async def __aenter__(self):
+        await self.connect()
+        if not await self.login():
+            await self.close()
+            raise ConnectionError(f"Ошибка авторизации на {self.router_ip}")
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def connect(self):
+        """Подключение к роутеру и запуск фонового чтения ответов."""
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.router_ip, self.port), self.timeout)
+        self._lost = None
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+    
+    async def close(self):
+        """Закрытие соединения и отмена фонового чтения."""
+        if self._reader_task:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader_task = None
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.writer = None
+        self._fail_pending(ConnectionError("Соединение закрыто"))
+    
+    async def _read_word(self):
+        """Чтение одного слова (заголовок длины 1-5 байт + данные)."""
+        first = (await self.reader.readexactly(1))[0]
+        prefix_size = length_prefix_size(first)
+        prefix = bytes([first])
+        if prefix_size > 1:
+            prefix += await self.reader.readexactly(prefix_size - 1)
+        length = decode_length(prefix)
+        if not length:
+            return ''
+        return str(await self.reader.readexactly(length), "windows-1251", "replace")
+    
+    async def _read_sentence(self):
+        """Чтение предложения до пустого слова."""
+        sentence = []
+        while True:
+            word = await self._read_word()
+            if not word:
+                return sentence
+            sentence.append(word)
+    
+    async def _read_loop(self):
+        """Фоновое чтение ответов и раздача их командам по тегу."""
+        try:
+            while True:
+                sentence = await self._read_sentence()
+                if not sentence:
                     continue
+                if sentence[0] == '!fatal':
+                    raise ConnectionError(f"Роутер закрыл сессию: {sentence}")
                 
-                # Проверяем создание финального скрипта
-                if self.verify_script_exists(script_name):
-                    print(f"✅ Финальный скрипт создан через {attempt + 1} секунд!")
-                    script_created = True
-                    break
-                
-                # Показываем прогресс каждые 5 секунд
-                if (attempt + 1) % 5 == 0:
-                    print(f"   ⏳ Ожидание... ({attempt + 1}/60 сек)")
-            
-            if not script_created:
-                raise Exception(f"Таймаут ожидания создания скрипта {script_name} (60 секунд)")
-            
-            # ═══ ЭТАП 8: ДИАГНОСТИКА ОЧИСТКИ ═══
-            print(f"🔍 Диагностика очистки временных объектов:")
-            
-            # Проверяем что временные объекты удалены планировщиком
-            for part_num in range(1, len(parts) + 1):
-                temp_name = f"{script_name}-TEMP{part_num}"
-                if self.verify_script_exists(temp_name):
-                    print(f"   ⚠️  Временный скрипт {temp_name} ещё существует")
-                else:
-                    print(f"   ✅ Временный скрипт {temp_name} удален")
-            
-            combine_name = f"{script_name}-Combine"
-            if self.verify_script_exists(combine_name):
-                print(f"   ⚠️  Combine-скрипт {combine_name} ещё существует")
-            else:
-                print(f"   ✅ Combine-скрипт {combine_name} удален")
+                tag = None
+                for position in range(len(sentence) - 1, 0, -1):
+                    if sentence[position].startswith('.tag='):
+                        tag = sentence[position][5:]
+                        del sentence[position]
+                        break
                 
-            scheduler_name = f"run-{script_name}-combine"
-            if self.verify_scheduler_exists(scheduler_name):
-                print(f"   ⚠️  Планировщик {scheduler_name} ещё существует")
-            else:
-                print(f"   ✅ Планировщик {scheduler_name} удален")
+                if tag not in self._pending:
+                    continue  # Ответ на отмененную команду
+                replies, future = self._pending[tag]
+                replies.append(sentence)
+                if sentence[0] == '!done':
+                    del self._pending[tag]
+                    if not future.done():
+                        future.set_result(replies)
+        except asyncio.CancelledError:
+            raise
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as error:
+            self._connection_lost(ConnectionError(f"Соединение с {self.router_ip} потеряно: {error}"))
+        except Exception as error:
+            # Поток рассинхронизирован (например, недопустимый байт длины)
+            self._connection_lost(ConnectionError(f"Ошибка протокола с {self.router_ip}: {error}"))
+    
+    def _connection_lost(self, error):
+        """Пометка соединения закрытым: ожидающие и последующие команды получают ошибку."""
+        self._lost = error
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self._fail_pending(error)
+    
+    def _fail_pending(self, error):
+        """Завершение всех ожидающих команд ошибкой."""
+        for _, future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+    
+    async def execute(self, words, timeout=None):
+        """
+        Выполнение команды с ожиданием !done.
+        
+        Args:
+            words (list): Слова команды
+            timeout (float): Таймаут команды (по умолчанию self.timeout)
             
-            print(f"✅ Большой скрипт {script_name} успешно загружен и объединен!")
-            print(f"📊 Статистика: {len(parts)} частей → 1 финальный скрипт")
+        Returns:
+            list: Предложения ответа (включая !done)
             
-            self.uploaded_count += 1
+        Raises:
+            RouterOSTrapError: Если роутер ответил !trap
+            ConnectionError: Нет подключения или оно оборвалось
+            asyncio.TimeoutError: При превышении таймаута (команда отменяется)
+        """
+        if self._lost is not None:
+            raise ConnectionError(str(self._lost))
+        if self.writer is None:
+            raise ConnectionError("Нет подключения к роутеру")
+        
+        tag = str(self._next_tag)
+        self._next_tag += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tag] = ([], future)
+        
+        self.writer.write(bytes(encode_sentence(list(words) + [f'.tag={tag}'])))
+        try:
+            await self.writer.drain()
+            replies = await asyncio.wait_for(future, timeout or self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # Команда больше не нужна - просим роутер прекратить ее выполнение
+            self._pending.pop(tag, None)
+            if self.writer is not None and not self.writer.is_closing():
+                self.writer.write(bytes(encode_sentence(['/cancel', f'=tag={tag}'])))
+            raise
+        
+        for sentence in replies:
+            if sentence[0] == '!trap':
+                raise RouterOSTrapError(words[0], sentence)
+        return replies
+    
+    async def login(self):
+        """
+        Авторизация (RouterOS 6.43+ / 7.x).
+        
+        Returns:
+            bool: True если авторизация успешна
+        """
+        try:
+            await self.execute(['/login', f'=name={self.username}', f'=password={self.password}'])
             return True
-            
-        except Exception as error:
-            print(f"❌ Критическая ошибка при загрузке большого файла:")
-            print(f"   {error}")
-            print(f"🧹 Рекомендуется ручная очистка временных объектов")
-            self.failed_count += 1
+        except RouterOSTrapError:
             return False
-        finally:
-            # ═══ ОЧИСТКА РЕСУРСОВ ═══
-            if 'sock' in locals():
-                sock.close()
-            # Сокращенная пауза для стабилизации системы после сложной операции
-            time.sleep(1)
+    
+    @staticmethod
+    def parse_attributes(sentence):
+        """Преобразование слов =ключ=значение предложения !re в словарь."""
+        attributes = {}
+        for word in sentence[1:]:
+            if word.startswith('='):
+                key, _, value = word[1:].partition('=')
+                attributes[key] = value
+        return attributes
+    
+    async def print(self, menu, proplist=None, queries=(), timeout=None):
+        """
+        Вывод объектов меню.
+        
+        Args:
+            menu (str): Меню, например '/system/script'
+            proplist (list): Запрашиваемые свойства (=.proplist=)
+            queries (iterable): Слова фильтра, например ['?name=Nasos-Runner']
+            timeout (float): Таймаут команды
+            
+        Returns:
+            list: Словари свойств объектов
+        """
+        words = [f'{menu}/print']
+        if proplist:
+            words.append(f'=.proplist={",".join(proplist)}')
+        words.extend(queries)
+        replies = await self.execute(words, timeout)
+        return [self.parse_attributes(sentence) for sentence in replies if sentence[0] == '!re']
+    
+    async def find_ids(self, menu, name):
+        """ID объектов меню с указанным именем."""
+        items = await self.print(menu, proplist=['.id', 'name'], queries=[f'?name={name}'])
+        return [item['.id'] for item in items if '.id' in item]
+    
+    async def _add(self, menu, properties):
+        words = [f'{menu}/add'] + [f'={key}={value}' for key, value in properties.items()]
+        replies = await self.execute(words)
+        done = replies[-1]
+        return next((word[5:] for word in done if word.startswith('=ret=')), None)
+    
+    async def _remove(self, menu, name):
+        ids = await self.find_ids(menu, name)
+        if ids:
+            await self.execute([f'{menu}/remove', f'=.id={",".join(ids)}'])
+        return bool(ids)
+    
+    async def _set(self, menu, name, properties):
+        ids = await self.find_ids(menu, name)
+        if not ids:
+            raise RouterOSTrapError(f'{menu}/set', ['!trap', f'=message=no such item: {name}'])
+        words = [f'{menu}/set', f'=.id={",".join(ids)}']
+        words += [f'={key.replace("_", "-")}={value}' for key, value in properties.items()]
+        await self.execute(words)
+    
+    async def add_script(self, name, source, policy=MikrotikUploader.SCRIPT_POLICY[8:]):
+        """Создание скрипта. Возвращает ID нового скрипта."""
+        source = source.replace('\r\n', '\n').replace('\r', '\n')
+        return await self._add('/system/script', {'name': name, 'source': source, 'policy': policy})
+    
+    async def remove_script(self, name):
+        """Удаление скрипта по имени. Возвращает True если скрипт существовал."""
+        return await self._remove('/system/script', name)
+    
+    async def set_script(self, name, **properties):
+        """Изменение свойств скрипта (имена с '_' передаются как '-')."""
+        await self._set('/system/script', name, properties)
+    
+    async def add_scheduler(self, name, on_event, **properties):
+        """Создание шедулера. Возвращает ID нового шедулера."""
+        properties = {key.replace('_', '-'): value for key, value in properties.items()}
+        return await self._add('/system/scheduler', dict(name=name, **{'on-event': on_event}, **properties))
+    
+    async def remove_scheduler(self, name):
+        """Удаление шедулера по имени. Возвращает True если шедулер существовал."""
+        return await self._remove('/system/scheduler', name)
+    
+    async def set_scheduler(self, name, **properties):
+        """Изменение свойств шедулера, например set_scheduler(name, disabled='yes')."""
+        await self._set('/system/scheduler', name, properties)
+    
+    async def get_clock(self):
+        """Системные дата и время роутера (словарь с ключами time, date, ...)."""
+        items = await self.print('/system/clock')
+        return items[0] if items else {}
+    
+    async def list_jobs(self):
+        """Список выполняющихся задач (/system/script/job)."""
+        return await self.print('/system/script/job')
 
-class RouterConfig:
-    """Конфигурация роутера для подключения."""
-    def __init__(self, name="", ip="", username="", password="", port=8728):
-        self.name = name
-        self.ip = ip
-        self.username = username
-        self.password = password
-        self.port = port
+async def run_on_routers(routers, operation, timeout=None):
+    """
+    Одновременное выполнение операции на нескольких роутерах.
     
-    def to_dict(self):
-        return {
-            'name': self.name,
-            'ip': self.ip,
-            'username': self.username,
-            'password': self.password,
-            'port': self.port
-        }
+    Для каждого роутера открывается собственный AsyncRouterOSClient,
+    все операции выполняются в одном цикле событий.
     
-    @classmethod
-    def from_dict(cls, data):
-        return cls(
-            data.get('name', ''),
-            data.get('ip', ''),
-            data.get('username', ''),
-            data.get('password', ''),
-            data.get('port', 8728)
-        )
+    Args:
+        routers (list): Конфигурации роутеров (RouterConfig)
+        operation (callable): async функция operation(client) -> результат
+        timeout (float): Общий таймаут на роутер (подключение + операция)
+        
+    Returns:
+        list: Результаты в порядке роутеров. Для роутеров с ошибкой
+              вместо результата возвращается исключение
+    """
+    async def run_one(router):
+        async with AsyncRouterOSClient.from_router(router) as client:
+            return await operation(client)
+    
+    async def run_with_timeout(router):
+        if timeout:
+            return await asyncio.wait_for(run_one(router), timeout)
+        return await run_one(router)
+    
+    return await asyncio.gather(*(run_with_timeout(router) for router in routers),
+                                return_exceptions=True)
+
+class LogSink:
+    """
+    Очередь сообщений журнала между рабочими потоками и окном GUI.
+    
+    put вызывается из любого потока, drain - из основного потока Tk:
+    он забирает все накопленное (или сколько успеет за отведенное время)
+    одним списком, чтобы окно получило одну вставку вместо вставки на
+    каждую строку.
+    
+    Если очередь достигла limit (окно не успевает за потоками), новые
+    сообщения не ставятся в очередь, а только подсчитываются - drain
+    возвращает их количество для одной итоговой строки.
+    """
+    
+    def __init__(self, limit=5000):
+        self.limit = limit
+        self._messages = deque()
+        self._dropped = 0
+        self._lock = threading.Lock()
+    
+    def put(self, message):
+        """Добавление сообщения (или подсчет пропущенного при переполнении)."""
+        if len(self._messages) >= self.limit:
+            with self._lock:
+                self._dropped += 1
+            return
+        self._messages.append(message)
+    
+    def pending(self):
+        """Количество сообщений, ожидающих вывода."""
+        return len(self._messages)
+    
+    def drain(self, time_budget):
+        """
+        Извлечение накопленных сообщений.
+        
+        Args:
+            time_budget (float): Наибольшее время извлечения (сек)
+            
+        Returns:
+            tuple: (список сообщений, количество пропущенных при переполнении)
+        """
+        messages = []
+        stop_at = time.monotonic() + time_budget
+        while self._messages:
+            messages.append(self._messages.popleft())
+            if len(messages) % 256 == 0 and time.monotonic() >= stop_at:
+                break
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+        return messages, dropped
 
 class MikrotikUploaderGUI:
     """Главный класс GUI приложения."""
     
+    # Бюджеты времени операций с роутером (сек) - см. Deadline
+    REFRESH_BUDGET = 5.0              # Обновление списков (в т.ч. автообновление)
+    ACTION_BUDGET = 30.0              # Пакетное удаление, включение, остановка задач
+    UPLOAD_PROBE_BUDGET = 30.0        # Подключение и сверка отпечатков перед загрузкой
+    UPLOAD_BATCH_BUDGET = 60.0        # Пакетная загрузка: основа...
+    UPLOAD_BATCH_BUDGET_PER_SCRIPT = 2.0  # ...плюс на каждый скрипт пачки
+    UPLOAD_LARGE_BUDGET = 180.0       # Один большой скрипт: части, объединение, ожидание
+    
+    # Вывод журнала (см. process_log_queue)
+    LOG_DRAIN_BUDGET = 0.02           # Время на извлечение сообщений за один такт (сек)
+    LOG_BUSY_INTERVAL = 20            # Такт при оставшейся очереди (мс)
+    LOG_INTERVAL = 100                # Такт после вывода сообщений (мс)
+    LOG_IDLE_INTERVAL = 250           # Такт при пустой очереди (мс)
+    
+    # Сохраняемые ширины колонок: ключ настроек -> (атрибут Treeview, колонки)
+    COLUMN_WIDTH_TREES = {
+        'scripts': ('router_scripts_tree', ('name', 'size')),
+        'schedulers': ('router_schedulers_tree', ('name', 'status', 'next_run')),
+        'files': ('files_tree', ('name', 'size', 'modified')),
+    }
+    
     def __init__(self, root):
+        # Отметки времени запуска для отчета (см. mark_startup)
+        self._startup_marks = [("старт", time.perf_counter())]
+        
         self.root = root
         self.root.title("MikrotikUploader GUI v2.1.3")
         self.root.geometry("1200x800")
@@ -1097,7 +3708,19 @@ class MikrotikUploaderGUI:
         self.selected_router = None  # Выбранный роутер
         self.source_directory = ""  # Папка с исходниками
         self.file_vars = {}  # Переменные для чекбоксов файлов
-        self.log_queue = queue.Queue()  # Очередь для логов из потоков
+        self.log_sink = LogSink()  # Очередь для логов из потоков
+        self.session_pool = RouterSessionPool()  # Авторизованные API сессии по роутерам
+        self.refresh_coordinator = RefreshCoordinator(  # Не больше одного обновления на роутер
+            on_error=lambda key, e: self.log_message(f"⚠️ Ошибка обновления роутера {key[0]}:{key[1]}: {e}", "WARNING"))
+        self.deploy_manifest = DeployManifest()  # Что и когда загружено на каждый роутер
+        self.settings_store = SettingsStore(  # Настройки в памяти, запись на диск отложенная
+            on_error=lambda e: self.log_message(f"Ошибка сохранения настроек: {e}", "ERROR"))
+        self._fingerprint_cache = {}  # (путь, mtime, размер) -> отпечаток локального файла
+        self._fingerprint_thread = None  # Фоновый подсчет отпечатков для информации о загрузке
+        self._tree_rows = {}  # Treeview -> последние показанные строки [(iid, значения)]
+        self._router_content = None  # Последние полученные (скрипты, шедулеры) роутера
+        self._tab_builders = {}  # Вкладка notebook -> (название, построитель, фрейм) до первого показа
+        self._restored_width_trees = set()  # Treeview с уже восстановленными ширинами колонок
         
         # Переменные для восстановления настроек
         self.saved_router_index = -1
@@ -1108,17 +3731,27 @@ class MikrotikUploaderGUI:
         self.max_log_lines = 1000  # Максимальное количество строк в логе
         self.log_mode = "full"  # "full" или "compact"
         
+        # Загружать только новые и измененные скрипты (по отпечатку в комментарии)
+        self.upload_changed_only = False
+        
         # Настройки автообновления
         self.auto_refresh_enabled = False
         self.auto_refresh_interval = 3  # Интервал в секундах (по умолчанию 3 сек)
         self.auto_refresh_timer = None
         self.last_refresh_time = None
         
+        # Переменные для контроля загрузки
+        self.upload_thread = None
+        self.upload_stop_flag = threading.Event()
+        
         # Загружаем сохраненные настройки
         self.load_settings()
+        self.mark_startup("настройки")
         
-        # Создаем интерфейс
+        # Создаем интерфейс (вкладки кроме видимой - при первом показе)
         self.create_interface()
+        self.restore_ui_settings()
+        self.mark_startup("интерфейс")
         
         # Запускаем обработчик логов
         self.process_log_queue()
@@ -1128,27 +3761,83 @@ class MikrotikUploaderGUI:
         
         # Показать окно поверх всех окон на 3 секунды
         self.show_window_on_top()
+        
+        # Поиск папки и обращения к роутеру - после первой отрисовки окна
+        self.root.after_idle(lambda: self.root.after(0, self.deferred_startup))
     
     def create_interface(self):
         """Создание основного интерфейса приложения."""
         # Создаем общий фрейм статуса внизу СНАЧАЛА (нужен для active_router_label)
         self.create_status_frame()
         
+        # Стиль списков общий для всех вкладок - до построения любой из них
+        style = ttk.Style()
+        style.configure("Custom.Treeview", font=('Arial', 12), rowheight=22)
+        style.configure("Custom.Treeview.Heading", font=('Arial', 11, 'bold'))
+        
         # Создаем notebook для вкладок
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=(5, 10))
         
-        # Создаем вкладки
-        self.create_routers_tab()
-        self.create_files_tab()
-        self.create_content_tab()
-        self.create_upload_tab()
+        # Вкладки добавляются пустыми и строятся при первом показе
+        for text, builder in (("🌐 Роутеры", self.create_routers_tab),
+                              ("📁 Файлы", self.create_files_tab),
+                              ("📋 Содержимое", self.create_content_tab),
+                              ("🚀 Загрузка", self.create_upload_tab)):
+            frame = ttk.Frame(self.notebook, padding="10")
+            self.notebook.add(frame, text=text)
+            self._tab_builders[str(frame)] = (text, builder, frame)
+        
+        self.notebook.bind("<<NotebookTabChanged>>", lambda event: self.build_tab(self.notebook.select()))
+        self.build_tab(self.notebook.select())  # Видимая вкладка строится сразу
     
-    def create_routers_tab(self):
-        """Вкладка управления роутерами."""
-        routers_frame = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(routers_frame, text="🌐 Роутеры")
+    def build_tab(self, tab_id):
+        """Построение содержимого вкладки при первом показе (повторные вызовы ничего не делают)."""
+        entry = self._tab_builders.pop(str(tab_id), None)
+        if entry is None:
+            return
+        text, builder, frame = entry
+        started = time.perf_counter()
+        builder(frame)
+        
+        # Состояние, полученное до построения вкладки
+        self.restore_column_widths()
+        self.update_router_status()
+        if self._router_content is not None:
+            self.show_router_content(*self._router_content)
+        self.update_upload_info()
+        
+        self.log_message(f"⏱️ Вкладка {text} построена за {(time.perf_counter() - started) * 1000:.0f} мс")
+    
+    def mark_startup(self, label):
+        """Отметка завершения этапа запуска для отчета о времени запуска."""
+        self._startup_marks.append((label, time.perf_counter()))
+    
+    def deferred_startup(self):
+        """
+        Задачи запуска после первой отрисовки окна.
+        
+        Автопоиск папки с исходниками, первое обновление восстановленного
+        роутера и запуск автообновления не задерживают появление окна.
+        В журнал выводится отчет о времени этапов запуска.
+        """
+        self.mark_startup("первая отрисовка")
+        
+        self.auto_find_directory()
+        if self.selected_router:
+            if self.auto_refresh_enabled:
+                self.start_auto_refresh()  # Первое обновление - сразу
+            else:
+                self.request_refresh(verbose=False)
+        self.mark_startup("отложенные задачи")
         
+        stages = [f"{label} {(end - start) * 1000:.0f} мс"
+                  for (_, start), (label, end) in zip(self._startup_marks, self._startup_marks[1:])]
+        total = (self._startup_marks[-1][1] - self._startup_marks[0][1]) * 1000
+        self.log_message(f"⏱️ Запуск: {', '.join(stages)}; всего {total:.0f} мс")
+    
+    def create_routers_tab(self, routers_frame):
+        """Вкладка управления роутерами."""
         # Список роутеров
         list_frame = ttk.LabelFrame(routers_frame, text="Список роутеров", padding="5")
         list_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
@@ -1294,8 +3983,9 @@ class MikrotikUploaderGUI:
         
         def auto_refresh_worker():
             if self.auto_refresh_enabled and self.selected_router:
-                # Запускаем обновление в отдельном потоке чтобы не блокировать UI
-                threading.Thread(target=self.auto_load_router_content_silent, daemon=True).start()
+                # Обновление в отдельном потоке; пропускается, если предыдущее
+                # еще выполняется или действует пауза после неудач
+                self.request_refresh(verbose=False, force=False)
                 
                 # Планируем следующее обновление
                 if self.auto_refresh_enabled:  # Проверяем еще раз на случай если отключили во время выполнения
@@ -1317,109 +4007,57 @@ class MikrotikUploaderGUI:
             return
         
         self.log_message("🔄 Ручное обновление данных роутера", "INFO")
-        threading.Thread(target=self.auto_load_router_content, daemon=True).start()
-    
-    def auto_load_router_content_silent(self):
-        """Автоматическая загрузка содержимого роутера без подробного логирования."""
-        if not self.selected_router:
-            return
-        
-        try:
-            uploader = MikrotikUploader()
-            uploader.router_ip = self.selected_router.ip
-            uploader.username = self.selected_router.username
-            uploader.password = self.selected_router.password
-            uploader.port = self.selected_router.port
-            
-            # Подключаемся с коротким таймаутом для автообновления
-            uploader.connect()
-            uploader.sock.settimeout(2.0)  # Короткий таймаут для автообновления
-            
-            if not uploader.login():
-                raise Exception("Ошибка авторизации")
-            
-            # Получаем скрипты БЕЗ source поля
-            uploader.write_sentence(['/system/script/print', '=.proplist=.id,name,owner,run-count'])
-            scripts = []
-            
-            while True:
-                try:
-                    reply = uploader.read_sentence()
-                    if not reply or reply[0] == '!done':
-                        break
-                    elif reply[0] == '!re':
-                        script_info = {'name': '', 'owner': '', 'run-count': '0'}
-                        for item in reply[1:]:
-                            if item.startswith('=name='):
-                                script_info['name'] = item[6:]
-                            elif item.startswith('=owner='):
-                                script_info['owner'] = item[7:]
-                            elif item.startswith('=run-count='):
-                                script_info['run-count'] = item[12:]
-                        
-                        if script_info['name']:
-                            scripts.append(script_info)
-                    elif reply[0] == '!trap':
-                        break
-                except:
-                    break
-            
-            # Получаем шедулеры
-            uploader.write_sentence(['/system/scheduler/print'])
-            schedulers = []
-            
-            while True:
-                try:
-                    reply = uploader.read_sentence()
-                    if not reply or reply[0] == '!done':
-                        break
-                    elif reply[0] == '!re':
-                        scheduler_info = {'name': '', 'disabled': 'true', 'next-run': ''}
-                        for item in reply[1:]:
-                            if item.startswith('=name='):
-                                scheduler_info['name'] = item[6:]
-                            elif item.startswith('=disabled='):
-                                scheduler_info['disabled'] = item[10:]
-                            elif item.startswith('=next-run='):
-                                scheduler_info['next-run'] = item[11:]
-                        
-                        if scheduler_info['name']:
-                            schedulers.append(scheduler_info)
-                    elif reply[0] == '!trap':
-                        break
-                except:
-                    break
-            
-            uploader.sock.close()
+        self.auto_load_router_content()
+    
+    def request_refresh(self, verbose=False, force=True):
+        """
+        Запрос обновления содержимого выбранного роутера через координатор.
+        
+        Args:
+            verbose (bool): Подробное обновление с журналом
+            force (bool): Выполнить, даже если действует пауза после неудач
+        """
+        router = self.selected_router
+        if not router:
+            return None
+        
+        def job(verbose):
+            if verbose:
+                return self.load_router_content_verbose(router)
+            return self.auto_load_router_content_silent(router)
+        
+        return self.refresh_coordinator.request(router.session_key(), job, verbose, force)
+    
+    def auto_load_router_content_silent(self, router=None):
+        """
+        Загрузка содержимого роутера без подробного логирования.
+        
+        Returns:
+            bool: True если списки получены
+        """
+        router = router or self.selected_router
+        if not router:
+            return False
+        
+        try:
+            deadline = Deadline(self.REFRESH_BUDGET, phase="автообновление")
+            with self.session_pool.session(router, deadline=deadline) as uploader:
+                # Скрипты БЕЗ source поля и шедулеры - только нужные свойства
+                scripts = [script for script in uploader.iter_records('/system/script', ScriptRecord)
+                           if script.name]
+                schedulers = [scheduler for scheduler in uploader.iter_records('/system/scheduler', SchedulerRecord)
+                              if scheduler.name]
             
             # Обновляем время последнего обновления
             self.last_refresh_time = datetime.now()
             
             def update_ui():
-                # Обновляем UI
-                if hasattr(self, 'router_scripts_tree'):
-                    self.router_scripts_tree.delete(*self.router_scripts_tree.get_children())
-                    for script in scripts:
-                        run_count = script.get('run-count', '0')
-                        self.router_scripts_tree.insert('', 'end', values=(script['name'], run_count))
-                
-                if hasattr(self, 'router_schedulers_tree'):
-                    self.router_schedulers_tree.delete(*self.router_schedulers_tree.get_children())
-                    for scheduler in schedulers:
-                        status = "✓" if scheduler.get('disabled') == 'false' else "✗"
-                        next_run = scheduler.get('next-run', 'никогда')
-                        self.router_schedulers_tree.insert('', 'end', values=(scheduler['name'], status, next_run))
-                
-                if hasattr(self, 'remote_scripts_tree'):
-                    self.remote_scripts_tree.delete(*self.remote_scripts_tree.get_children())
-                    for script in scripts:
-                        run_count = script.get('run-count', '0')
-                        self.remote_scripts_tree.insert('', 'end', values=(script['name'], run_count))
-                    
-                    self.remote_status_var.set(f"Скриптов: {len(scripts)}, Шедулеров: {len(schedulers)}")
+                # Пока шло обновление, мог быть выбран другой роутер
+                if router is not self.selected_router:
+                    return
                 
-                if hasattr(self, 'content_status_var'):
-                    self.content_status_var.set(f"Скриптов: {len(scripts)}, Шедулеров: {len(schedulers)}")
+                # Обновляем только изменившиеся строки списков
+                self.show_router_content(scripts, schedulers)
                 
                 # Обновляем время последнего обновления
                 if hasattr(self, 'last_refresh_label'):
@@ -1427,10 +4065,13 @@ class MikrotikUploaderGUI:
                     self.last_refresh_label.config(text=time_str, foreground='green')
             
             self.root.after(0, update_ui)
+            return True
             
         except Exception as e:
             # При ошибке автообновления просто обновляем статус без детального логирования
             def update_error_status():
+                if router is not self.selected_router:
+                    return
                 if hasattr(self, 'last_refresh_label'):
                     self.last_refresh_label.config(text="ошибка", foreground='red')
                 if hasattr(self, 'remote_status_var'):
@@ -1439,12 +4080,10 @@ class MikrotikUploaderGUI:
                     self.content_status_var.set("Ошибка подключения")
             
             self.root.after(0, update_error_status)
+            return False
     
-    def create_files_tab(self):
+    def create_files_tab(self, files_frame):
         """Вкладка выбора файлов для загрузки."""
-        files_frame = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(files_frame, text="📁 Файлы")
-        
         # Выбор папки с исходниками
         dir_frame = ttk.LabelFrame(files_frame, text="Папка с исходниками", padding="5")
         dir_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -1541,15 +4180,17 @@ class MikrotikUploaderGUI:
         files_frame.columnconfigure(0, weight=1)
         files_frame.rowconfigure(1, weight=1)
         
+        # Папка, восстановленная из настроек или найденная автопоиском до построения вкладки
+        self.source_dir_var.set(self.source_directory)
+        if self.source_directory:
+            self.refresh_files_list()
+        
         # Переменные для работы с файлами удалены - используется стандартное выделение
     
 
     
-    def create_content_tab(self):
+    def create_content_tab(self, content_frame):
         """Вкладка просмотра содержимого роутера."""
-        content_frame = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(content_frame, text="📋 Содержимое")
-        
         # Кнопка подключения и управления
         connect_frame = ttk.Frame(content_frame)
         connect_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -1593,9 +4234,6 @@ class MikrotikUploaderGUI:
         self.router_scripts_tree.column("name", width=280, anchor=tk.W)
         self.router_scripts_tree.column("size", width=100, anchor=tk.E)
         
-        style = ttk.Style()
-        style.configure("Custom.Treeview", font=('Arial', 12), rowheight=22)
-        style.configure("Custom.Treeview.Heading", font=('Arial', 11, 'bold'))
         self.router_scripts_tree.configure(style="Custom.Treeview")
         
         scrollbar_router_scripts = ttk.Scrollbar(scripts_frame, orient=tk.VERTICAL, 
@@ -1719,11 +4357,8 @@ class MikrotikUploaderGUI:
         content_frame.columnconfigure(0, weight=1)
         content_frame.rowconfigure(1, weight=1)
     
-    def create_upload_tab(self):
+    def create_upload_tab(self, upload_frame):
         """Вкладка загрузки файлов."""
-        upload_frame = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(upload_frame, text="🚀 Загрузка")
-        
         # Информация о предстоящей загрузке
         info_frame = ttk.LabelFrame(upload_frame, text="Информация о загрузке", padding="5")
         info_frame.grid(row=0, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -1756,6 +4391,10 @@ class MikrotikUploaderGUI:
                                     command=self.stop_upload, state=tk.DISABLED)
         self.stop_button.pack(side=tk.LEFT)
         
+        self.changed_only_var = tk.BooleanVar(value=self.upload_changed_only)
+        ttk.Checkbutton(control_frame, text="Только измененные", variable=self.changed_only_var,
+                        command=self.on_changed_only_change).pack(side=tk.LEFT, padx=(15, 0))
+        
         # Лог операций
         log_frame = ttk.LabelFrame(upload_frame, text="Лог операций", padding="5")
         log_frame.grid(row=3, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -1789,18 +4428,8 @@ class MikrotikUploaderGUI:
         upload_frame.columnconfigure(0, weight=1)
         upload_frame.rowconfigure(3, weight=1)  # Лог растягивается
         
-        # Переменные для контроля загрузки
-        self.upload_thread = None
-        self.upload_stop_flag = threading.Event()
-        
         # Обновляем информацию о загрузке
         self.update_upload_info()
-        
-        # Попытка автопоиска папки после создания всех элементов
-        self.auto_find_directory()
-        
-        # Восстанавливаем настройки после создания всех элементов
-        self.restore_ui_settings()
     
     def log_message(self, message, level="INFO"):
         """Логирование сообщений с поддержкой режимов и ограничения количества строк."""
@@ -1820,7 +4449,7 @@ class MikrotikUploaderGUI:
             formatted_message = f"[{timestamp}] {level}: {message}\n"
         
         # Добавляем в очередь для обработки в основном потоке
-        self.log_queue.put(formatted_message)
+        self.log_sink.put(formatted_message)
     
     def update_window_title(self):
         """Обновление заголовка окна с именем выбранного роутера."""
@@ -1845,7 +4474,7 @@ class MikrotikUploaderGUI:
         self.root.after(3000, remove_topmost)  # 3000 мс = 3 секунды
     
     def restore_ui_settings(self):
-        """Восстановление настроек интерфейса после создания всех элементов."""
+        """Восстановление выбора роутера и геометрии окна после создания интерфейса."""
         # Восстанавливаем выбранный роутер
         if hasattr(self, 'saved_router_index') and self.saved_router_index >= 0:
             if self.saved_router_index < len(self.routers):
@@ -1857,39 +4486,6 @@ class MikrotikUploaderGUI:
                 self.update_router_status()
                 self.log_message(f"Восстановлен выбор роутера: {self.selected_router.name}")
         
-        # Восстанавливаем ширины колонок
-        if hasattr(self, 'saved_column_widths'):
-            # Ширины колонок скриптов
-            if 'scripts' in self.saved_column_widths:
-                scripts_widths = self.saved_column_widths['scripts']
-                if hasattr(self, 'router_scripts_tree'):
-                    if 'name' in scripts_widths:
-                        self.router_scripts_tree.column('name', width=scripts_widths['name'])
-                    if 'size' in scripts_widths:
-                        self.router_scripts_tree.column('size', width=scripts_widths['size'])
-            
-            # Ширины колонок шедулеров
-            if 'schedulers' in self.saved_column_widths:
-                schedulers_widths = self.saved_column_widths['schedulers']
-                if hasattr(self, 'router_schedulers_tree'):
-                    if 'name' in schedulers_widths:
-                        self.router_schedulers_tree.column('name', width=schedulers_widths['name'])
-                    if 'status' in schedulers_widths:
-                        self.router_schedulers_tree.column('status', width=schedulers_widths['status'])
-                    if 'next_run' in schedulers_widths:
-                        self.router_schedulers_tree.column('next_run', width=schedulers_widths['next_run'])
-            
-            # Ширины колонок файлов
-            if 'files' in self.saved_column_widths:
-                files_widths = self.saved_column_widths['files']
-                if hasattr(self, 'files_tree'):
-                    if 'name' in files_widths:
-                        self.files_tree.column('name', width=files_widths['name'])
-                    if 'size' in files_widths:
-                        self.files_tree.column('size', width=files_widths['size'])
-                    if 'modified' in files_widths:
-                        self.files_tree.column('modified', width=files_widths['modified'])
-        
         # Восстанавливаем размер и положение окна
         if hasattr(self, 'saved_window_geometry') and self.saved_window_geometry:
             try:
@@ -1897,6 +4493,77 @@ class MikrotikUploaderGUI:
             except:
                 pass  # Игнорируем ошибки восстановления геометрии
     
+    def restore_column_widths(self):
+        """Восстановление сохраненных ширин колонок у построенных Treeview (один раз на виджет)."""
+        for key, (attribute, columns) in self.COLUMN_WIDTH_TREES.items():
+            tree = getattr(self, attribute, None)
+            if tree is None or attribute in self._restored_width_trees:
+                continue
+            self._restored_width_trees.add(attribute)
+            widths = self.saved_column_widths.get(key, {})
+            for column in columns:
+                if column in widths:
+                    tree.column(column, width=widths[column])
+    
+    def reconcile_tree(self, tree, rows):
+        """
+        Обновление Treeview по ключам строк без полной перерисовки.
+        
+        rows - список пар (ключ, значения); ключ (.id или имя объекта)
+        становится iid строки. Удаляются только исчезнувшие строки,
+        добавляются новые, значения меняются только у изменившихся.
+        Существующие строки остаются на месте, поэтому выделение,
+        прокрутка и пользовательская сортировка сохраняются. Если набор
+        строк не изменился - виджет не затрагивается.
+        
+        Returns:
+            bool: True если виджет был изменен
+        """
+        rows = [(str(key), tuple(values)) for key, values in rows]
+        shown = self._tree_rows.get(tree)
+        if shown == rows:
+            return False
+        
+        children = tree.get_children('')
+        shown = dict(shown or ())
+        if set(children) != set(shown):
+            shown = {}  # Строки менялись в обход сверки - значения сверяем заново
+        
+        wanted = dict(rows)
+        stale = [iid for iid in children if iid not in wanted]
+        if stale:
+            tree.delete(*stale)
+        
+        for index, (iid, values) in enumerate(rows):
+            if not tree.exists(iid):
+                tree.insert('', index, iid=iid, values=values)
+            elif shown.get(iid) != values:
+                tree.item(iid, values=values)
+        
+        self._tree_rows[tree] = rows
+        return True
+    
+    def show_router_content(self, scripts, schedulers):
+        """Отображение скриптов и шедулеров роутера (ScriptRecord, SchedulerRecord)."""
+        self._router_content = (scripts, schedulers)  # Для вкладок, построенных позже
+        script_rows = [(script.id or script.name, (script.name, script.run_count))
+                       for script in scripts]
+        scheduler_rows = [(scheduler.id or scheduler.name,
+                           (scheduler.name, "✓" if scheduler.enabled else "✗", scheduler.next_run))
+                          for scheduler in schedulers]
+        
+        if hasattr(self, 'router_scripts_tree'):
+            self.reconcile_tree(self.router_scripts_tree, script_rows)
+        if hasattr(self, 'router_schedulers_tree'):
+            self.reconcile_tree(self.router_schedulers_tree, scheduler_rows)
+        if hasattr(self, 'remote_scripts_tree'):
+            self.reconcile_tree(self.remote_scripts_tree, script_rows)
+        
+        status = f"Скриптов: {len(scripts)}, Шедулеров: {len(schedulers)}"
+        for status_var in (getattr(self, 'remote_status_var', None), getattr(self, 'content_status_var', None)):
+            if status_var is not None and status_var.get() != status:
+                status_var.set(status)
+    
     def sort_treeview(self, tree, col, is_numeric, reverse=False):
         """Сортировка Treeview по указанной колонке."""
         data = [(tree.set(child, col), child) for child in tree.get_children('')]
@@ -1923,42 +4590,61 @@ class MikrotikUploaderGUI:
             tree.heading(col, command=lambda: self.sort_treeview(tree, col, False, next_reverse))
     
     def process_log_queue(self):
-        """Обработка очереди логов с ограничением количества строк."""
-        try:
-            messages_added = 0
-            while messages_added < 10:  # Обрабатываем не более 10 сообщений за раз
-                message = self.log_queue.get_nowait()
-                
-                self.log_text.config(state=tk.NORMAL)
-                self.log_text.insert(tk.END, message)
-                self.log_text.see(tk.END)
-                
-                # Проверяем количество строк и удаляем старые если нужно
-                line_count = int(self.log_text.index('end-1c').split('.')[0])
-                if line_count > self.max_log_lines:
-                    # Удаляем первые строки, оставляя последние max_log_lines
-                    lines_to_delete = line_count - self.max_log_lines
-                    self.log_text.delete(1.0, f"{lines_to_delete + 1}.0")
-                
-                self.log_text.config(state=tk.DISABLED)
-                messages_added += 1
-                
-        except queue.Empty:
-            pass
+        """
+        Вывод накопленных сообщений журнала одной вставкой.
+        
+        За такт из очереди забирается все накопленное (в пределах
+        LOG_DRAIN_BUDGET), склеивается в одну строку и вставляется одним
+        insert с одной обрезкой до max_log_lines. Сообщения сверх
+        max_log_lines и пропущенные при переполнении очереди не
+        отрисовываются - вместо них выводится одна итоговая строка.
+        Интервал следующего такта зависит от глубины очереди.
+        """
+        if not hasattr(self, 'log_text'):
+            # Вкладка с журналом еще не построена - сообщения ждут в очереди
+            self.root.after(self.LOG_IDLE_INTERVAL, self.process_log_queue)
+            return
         
-        # Планируем следующую проверку
-        self.root.after(100, self.process_log_queue)
+        messages, dropped = self.log_sink.drain(self.LOG_DRAIN_BUDGET)
+        
+        # В окне остаются только последние max_log_lines строк - лишнее не отрисовываем
+        if dropped or len(messages) > self.max_log_lines:
+            keep = self.max_log_lines - 2  # Место для итоговой строки (и пустой последней)
+            if len(messages) > keep:
+                dropped += len(messages) - keep
+                messages = messages[-keep:]
+        if dropped:
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            messages.insert(0, f"[{timestamp}] WARNING: ⏩ Пропущено сообщений журнала: {dropped}\n")
+        
+        if messages:
+            self.log_text.config(state=tk.NORMAL)
+            self.log_text.insert(tk.END, ''.join(messages))
+            
+            # Удаляем старые строки, оставляя последние max_log_lines
+            line_count = int(self.log_text.index('end-1c').split('.')[0])
+            if line_count > self.max_log_lines:
+                lines_to_delete = line_count - self.max_log_lines
+                self.log_text.delete(1.0, f"{lines_to_delete + 1}.0")
+            
+            self.log_text.see(tk.END)
+            self.log_text.config(state=tk.DISABLED)
+        
+        # Планируем следующую проверку: чаще, пока очередь не разобрана
+        if self.log_sink.pending():
+            interval = self.LOG_BUSY_INTERVAL
+        elif messages:
+            interval = self.LOG_INTERVAL
+        else:
+            interval = self.LOG_IDLE_INTERVAL
+        self.root.after(interval, self.process_log_queue)
     
     def load_settings(self):
         """Загрузка сохраненных настроек."""
-        # Файл настроек ВСЕГДА создается рядом с модулем (абсолютный путь)
-        module_dir = os.path.dirname(os.path.abspath(__file__))
-        settings_file = os.path.join(module_dir, "uploader_settings.json")
         try:
-            if os.path.exists(settings_file):
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-                    
+            # Файл настроек ВСЕГДА находится рядом с модулем (см. SettingsStore)
+            settings = self.settings_store.load()
+            if settings:
                 # Загружаем роутеры
                 self.routers = [RouterConfig.from_dict(router_data) 
                               for router_data in settings.get('routers', [])]
@@ -1976,6 +4662,9 @@ class MikrotikUploaderGUI:
                 self.max_log_lines = settings.get('max_log_lines', 1000)
                 self.log_mode = settings.get('log_mode', 'full')
                 
+                # Режим инкрементальной загрузки
+                self.upload_changed_only = settings.get('upload_changed_only', False)
+                
                 # Сохраняем настройки автообновления
                 self.auto_refresh_enabled = settings.get('auto_refresh_enabled', False)
                 self.auto_refresh_interval = settings.get('auto_refresh_interval', 3)
@@ -1987,10 +4676,7 @@ class MikrotikUploaderGUI:
             self.log_message(f"Ошибка загрузки настроек: {e}", "ERROR")
     
     def save_settings(self):
-        """Сохранение настроек."""
-        # Файл настроек ВСЕГДА создается рядом с модулем (абсолютный путь)
-        module_dir = os.path.dirname(os.path.abspath(__file__))
-        settings_file = os.path.join(module_dir, "uploader_settings.json")
+        """Сохранение настроек (снимок в памяти, запись на диск - отложенно в фоне)."""
         try:
             # Сохраняем индекс выбранного роутера
             selected_router_index = -1
@@ -2000,25 +4686,12 @@ class MikrotikUploaderGUI:
                 except ValueError:
                     pass
             
-            # Сохраняем ширины колонок
-            column_widths = {}
-            if hasattr(self, 'router_scripts_tree'):
-                column_widths['scripts'] = {
-                    'name': self.router_scripts_tree.column('name', 'width'),
-                    'size': self.router_scripts_tree.column('size', 'width')
-                }
-            if hasattr(self, 'router_schedulers_tree'):
-                column_widths['schedulers'] = {
-                    'name': self.router_schedulers_tree.column('name', 'width'),
-                    'status': self.router_schedulers_tree.column('status', 'width'),
-                    'next_run': self.router_schedulers_tree.column('next_run', 'width')
-                }
-            if hasattr(self, 'files_tree'):
-                column_widths['files'] = {
-                    'name': self.files_tree.column('name', 'width'),
-                    'size': self.files_tree.column('size', 'width'),
-                    'modified': self.files_tree.column('modified', 'width')
-                }
+            # Сохраняем ширины колонок (для непостроенных вкладок - прежние значения)
+            column_widths = dict(self.saved_column_widths)
+            for key, (attribute, columns) in self.COLUMN_WIDTH_TREES.items():
+                tree = getattr(self, attribute, None)
+                if tree is not None:
+                    column_widths[key] = {column: tree.column(column, 'width') for column in columns}
             
             # Сохраняем размер и положение окна
             window_geometry = self.root.geometry()
@@ -2031,12 +4704,12 @@ class MikrotikUploaderGUI:
                 'window_geometry': window_geometry,
                 'max_log_lines': self.max_log_lines,
                 'log_mode': self.log_mode,
+                'upload_changed_only': self.upload_changed_only,
                 'auto_refresh_enabled': self.auto_refresh_enabled,
                 'auto_refresh_interval': self.auto_refresh_interval
             }
             
-            with open(settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, indent=2, ensure_ascii=False)
+            self.settings_store.update(settings)
                 
         except Exception as e:
             self.log_message(f"Ошибка сохранения настроек: {e}", "ERROR")
@@ -2254,8 +4927,9 @@ class MikrotikUploaderGUI:
         codenosos_dir = find_codenosos_dir()
         if codenosos_dir:
             self.source_directory = codenosos_dir
-            self.source_dir_var.set(codenosos_dir)
-            self.refresh_files_list()
+            if hasattr(self, 'source_dir_var'):  # Вкладка "Файлы" уже построена
+                self.source_dir_var.set(codenosos_dir)
+                self.refresh_files_list()
             self.log_message(f"Автоматически найдена папка: {codenosos_dir}")
         else:
             self.log_message("Папка CodeNasos не найдена автоматически", "WARNING")
@@ -2314,7 +4988,7 @@ class MikrotikUploaderGUI:
             return
             
         # Получаем выбранные файлы через стандартное выделение
-        selected_items = self.files_tree.selection()
+        selected_items = self.files_tree.selection() if hasattr(self, 'files_tree') else ()
         selected_files = []
         for item_id in selected_items:
             values = self.files_tree.item(item_id, 'values')
@@ -2328,7 +5002,13 @@ class MikrotikUploaderGUI:
             info_text += "Роутер: не выбран\n"
         
         info_text += f"Папка: {self.source_directory or 'не выбрана'}\n"
-        info_text += f"Файлов к загрузке: {len(selected_files)}\n"
+        info_text += f"Файлов к загрузке: {len(selected_files)}"
+        if self.selected_router and self.source_directory and selected_files:
+            # Состояние по локальному манифесту - без запросов к роутеру
+            unchanged = self.count_unchanged_by_manifest(selected_files)
+            if unchanged:
+                info_text += f" (без изменений по манифесту: {unchanged})"
+        info_text += "\n"
         
         if selected_files:
             info_text += f"Файлы: {', '.join(selected_files[:3])}"
@@ -2351,6 +5031,54 @@ class MikrotikUploaderGUI:
     
 
     
+    def count_unchanged_by_manifest(self, filenames):
+        """
+        Количество файлов, чья версия уже загружена на выбранный роутер (по манифесту).
+        
+        Учитываются файлы с уже посчитанным отпечатком; остальные
+        хешируются в фоновом потоке, после чего информация обновляется.
+        """
+        router_key = self.selected_router.manifest_key()
+        unchanged = 0
+        missing = []
+        for filename in filenames:
+            file_path = os.path.join(self.source_directory, filename)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            cache_key = (file_path, stat.st_mtime, stat.st_size)
+            fingerprint = self._fingerprint_cache.get(cache_key)
+            if fingerprint is None:
+                missing.append(cache_key)
+            elif self.deploy_manifest.is_current(router_key, filename.replace('.rsc', ''), fingerprint):
+                unchanged += 1
+        
+        if missing and not (self._fingerprint_thread and self._fingerprint_thread.is_alive()):
+            self._fingerprint_thread = threading.Thread(
+                target=self.fill_fingerprint_cache, args=(missing,), daemon=True)
+            self._fingerprint_thread.start()
+        return unchanged
+    
+    def fill_fingerprint_cache(self, cache_keys):
+        """Подсчет отпечатков локальных файлов в фоновом потоке."""
+        for cache_key in cache_keys:
+            file_path = cache_key[0]
+            try:
+                try:
+                    with codecs.open(file_path, 'r', encoding='utf-8-sig') as f:
+                        content = f.read()
+                except UnicodeDecodeError:
+                    with codecs.open(file_path, 'r', encoding='windows-1251') as f:
+                        content = f.read()
+                fingerprint = script_fingerprint(content)
+            except OSError:
+                fingerprint = ""  # Не совпадет с манифестом и не будет читаться повторно
+            self._fingerprint_cache[cache_key] = fingerprint
+        
+        # Информация о загрузке с учетом посчитанных отпечатков
+        self.root.after(0, self.update_upload_info)
+    
     def start_upload(self):
         """Запуск загрузки в отдельном потоке."""
         if self.upload_thread and self.upload_thread.is_alive():
@@ -2374,6 +5102,7 @@ class MikrotikUploaderGUI:
     
     def upload_worker(self):
         """Рабочий поток загрузки файлов."""
+        uploader = None  # Сессия загрузки; при ошибке закрывается в finally
         try:
             # Получаем выбранные файлы через стандартное выделение
             selected_items = self.files_tree.selection()
@@ -2395,17 +5124,29 @@ class MikrotikUploaderGUI:
             
             uploaded_count = 0
             failed_count = 0
+            skipped_count = 0
+            processed_count = 0
+            
+            # Загрузчик с параметрами выбранного роутера - одна сессия (один вход)
+            # на всю загрузку, после завершения сессия возвращается в пул
+            uploader = MikrotikUploader.for_router(self.selected_router)
+            uploader.keep_alive = True
+            uploader.deploy_manifest = self.deploy_manifest
+            router_key = self.selected_router.manifest_key()
+            remote_fingerprints = None  # Отпечатки скриптов роутера (режим "только измененные")
+            
+            # ═══ ЭТАП 1: ЧТЕНИЕ ФАЙЛОВ ═══
+            batch_files = []   # Загружаются одной конвейерной пачкой
+            single_files = []  # Загружаются по одному (разделение на части)
             
             for i, filename in enumerate(selected_files):
                 if self.upload_stop_flag.is_set():
-                    self.log_message("⏹️ Загрузка остановлена пользователем", "WARNING")
                     break
                 
                 file_path = os.path.join(self.source_directory, filename)
                 script_name = filename.replace('.rsc', '')
                 
                 self.log_message(f"📄 [{i+1}/{total_files}] Обработка файла: {filename}")
-                self.root.after(0, lambda filename=filename: self.progress_label.config(text=f"Загружаем {filename}..."))
                 
                 try:
                     # Читаем файл
@@ -2421,47 +5162,162 @@ class MikrotikUploaderGUI:
                         self.log_message(f"✅ Файл прочитан в Windows-1251, размер: {len(content)} символов")
                     
                     # Определяем тип загрузки
-                    content_size = len(content.encode('utf-8'))
-                    if content_size > 15000:
-                        self.log_message(f"📦 Большой файл ({content_size} байт), будет разделен на части")
-                    else:
+                    content_size = encoded_size(content)
+                    if content_size <= uploader.LARGE_SCRIPT_THRESHOLD:
                         self.log_message(f"📄 Обычный файл ({content_size} байт), прямая загрузка")
-                    
-                    # Создаем загрузчик
+                        batch_files.append((filename, script_name, content))
+                    elif self.deploy_manifest.is_direct_rejected(router_key, script_name):
+                        # Роутер уже отклонял этот скрипт одной командой
+                        self.log_message(f"📦 Большой файл ({content_size} байт), по манифесту - разделение на части")
+                        single_files.append((filename, script_name, content))
+                    elif uploader.large_upload_mode == "direct":
+                        self.log_message(f"📦 Большой файл ({content_size} байт), загрузка одной командой")
+                        batch_files.append((filename, script_name, content))
+                    else:
+                        self.log_message(f"📦 Большой файл ({content_size} байт), будет разделен на части")
+                        single_files.append((filename, script_name, content))
+                
+                except Exception as e:
+                    failed_count += 1
+                    processed_count += 1
+                    self.log_message(f"❌ Ошибка обработки {filename}: {e}", "ERROR")
+            
+            # ═══ ЭТАП 1.5: ПРОПУСК НЕИЗМЕНЕННЫХ ═══
+            if self.upload_changed_only and (batch_files or single_files) and not self.upload_stop_flag.is_set():
+                self.log_message("🔍 Сравнение отпечатков с роутером")
+                uploader.deadline = Deadline(self.UPLOAD_PROBE_BUDGET, self.upload_stop_flag, "сверка отпечатков")
+                try:
+                    if not uploader.ensure_session():
+                        raise Exception("Ошибка авторизации")
+                    # Только выбранные скрипты - без чтения всего списка роутера
+                    selected_names = [script_name for _, script_name, _ in batch_files + single_files]
+                    remote_fingerprints = uploader.fetch_script_fingerprints(
+                        RouterQuery().any_of('name', selected_names))
+                except Exception as e:
+                    self.log_message(f"⚠️ Не удалось получить отпечатки, загружаем все: {e}", "WARNING")
+                    uploader.close()
+                    remote_fingerprints = None
+                
+                if remote_fingerprints is not None:
+                    # Манифест приводится к фактическим отпечаткам роутера
+                    try:
+                        stale_count = self.deploy_manifest.reconcile(router_key, selected_names, remote_fingerprints)
+                        if stale_count:
+                            self.log_message(f"🔄 Манифест сверен с роутером (устаревших записей: {stale_count})")
+                    except OSError as e:
+                        self.log_message(f"⚠️ Не удалось обновить манифест: {e}", "WARNING")
+                
+                def changed(file_entry):
+                    filename, script_name, content = file_entry
+                    if remote_fingerprints is None:
+                        return True
+                    if remote_fingerprints.get(script_name) == script_fingerprint(content):
+                        self.log_message(f"⏭️ {filename} без изменений - пропущен")
+                        return False
+                    return True
+                
+                files_before = len(batch_files) + len(single_files)
+                batch_files = [entry for entry in batch_files if changed(entry)]
+                single_files = [entry for entry in single_files if changed(entry)]
+                skipped_count = files_before - len(batch_files) - len(single_files)
+                if skipped_count:
+                    processed_count += skipped_count
+                    self.log_message(f"⏭️ Пропущено без изменений: {skipped_count}, "
+                                     f"к загрузке: {len(batch_files) + len(single_files)}")
+                    self.root.after(0, lambda value=processed_count: self.progress_bar.config(value=value))
+            
+            # ═══ ЭТАП 2: ПАКЕТНАЯ ЗАГРУЗКА КОНВЕЙЕРОМ ═══
+            if batch_files and not self.upload_stop_flag.is_set():
+                self.log_message(f"⬆️ Пакетная загрузка {len(batch_files)} скриптов одним соединением")
+                self.root.after(0, lambda: self.progress_label.config(
+                    text=f"Загружаем {len(batch_files)} файлов..."))
+                
+                budget = self.UPLOAD_BATCH_BUDGET + self.UPLOAD_BATCH_BUDGET_PER_SCRIPT * len(batch_files)
+                uploader.deadline = Deadline(budget, self.upload_stop_flag, "пакетная загрузка")
+                try:
                     self.log_message(f"🔗 Создание подключения к роутеру")
-                    uploader = MikrotikUploader()
-                    uploader.router_ip = self.selected_router.ip
-                    uploader.username = self.selected_router.username
-                    uploader.password = self.selected_router.password
-                    uploader.port = self.selected_router.port
-                    
+                    if not uploader.ensure_session():
+                        raise Exception("Ошибка авторизации")
+                    results = uploader.upload_scripts(
+                        [(script_name, content) for _, script_name, content in batch_files])
+                except OperationCancelled:
+                    uploader.close()
+                    results = None  # Результаты пачки неизвестны - файлы не учитываются
+                except Exception as e:
+                    self.log_message(f"❌ Ошибка пакетной загрузки: {e}", "ERROR")
+                    uploader.close()
+                    results = {}
+                
+                if results is not None:
+                    for filename, script_name, content in batch_files:
+                        result = results.get(script_name, False)
+                        if result is None:
+                            # Роутер отклонил большой скрипт одной командой
+                            self.log_message(f"⚠️ {filename}: роутер отклонил загрузку одной командой, "
+                                             f"будет разделен на части", "WARNING")
+                            single_files.append((filename, script_name, content))
+                            continue
+                        
+                        processed_count += 1
+                        if result:
+                            uploaded_count += 1
+                            self.log_message(f"✅ {filename} загружен успешно")
+                        else:
+                            failed_count += 1
+                            self.log_message(f"❌ Ошибка загрузки {filename}", "ERROR")
+                
+                # Обновляем прогресс
+                self.root.after(0, lambda value=processed_count: self.progress_bar.config(value=value))
+            
+            # ═══ ЭТАП 3: БОЛЬШИЕ ФАЙЛЫ ПО ЧАСТЯМ ═══
+            for filename, script_name, content in single_files:
+                if self.upload_stop_flag.is_set():
+                    break
+                
+                self.root.after(0, lambda filename=filename: self.progress_label.config(text=f"Загружаем {filename}..."))
+                
+                uploader.deadline = Deadline(self.UPLOAD_LARGE_BUDGET, self.upload_stop_flag,
+                                             f"загрузка {script_name}")
+                try:
                     # Загружаем
                     self.log_message(f"⬆️ Начинаем загрузку скрипта: {script_name}")
-                    if uploader.upload_script(script_name, content):
+                    if uploader.upload_large_script(script_name, content):
                         uploaded_count += 1
                         self.log_message(f"✅ {filename} загружен успешно")
                     else:
                         failed_count += 1
                         self.log_message(f"❌ Ошибка загрузки {filename}", "ERROR")
                 
+                except OperationCancelled:
+                    break
                 except Exception as e:
                     failed_count += 1
                     self.log_message(f"❌ Ошибка обработки {filename}: {e}", "ERROR")
                 
                 # Обновляем прогресс
-                self.root.after(0, lambda i=i: self.progress_bar.config(value=i+1))
-                
-                if self.upload_stop_flag.is_set():
-                    break
+                processed_count += 1
+                self.root.after(0, lambda value=processed_count: self.progress_bar.config(value=value))
+            
+            if self.upload_stop_flag.is_set():
+                self.log_message("⏹️ Загрузка остановлена пользователем", "WARNING")
+            
+            # Сессия пригодится автообновлению - возвращаем ее в пул
+            self.session_pool.release(uploader)
+            uploader = None
             
             # Завершение
             if not self.upload_stop_flag.is_set():
-                self.log_message(f"🎉 Загрузка завершена! Успешно: {uploaded_count}, Ошибок: {failed_count}")
+                self.log_message(f"🎉 Загрузка завершена! Успешно: {uploaded_count}, Ошибок: {failed_count}"
+                                 + (f", Без изменений: {skipped_count}" if skipped_count else ""))
                 self.root.after(0, lambda: self.progress_label.config(text=f"Завершено: {uploaded_count}/{total_files}"))
             
         except Exception as e:
             self.log_message(f"❌ Критическая ошибка загрузки: {e}", "ERROR")
         finally:
+            # Сессия, не возвращенная в пул, закрывается (состояние протокола неизвестно)
+            if uploader is not None:
+                self.session_pool.release(uploader, discard=True)
+            
             # Сбрасываем поток и возвращаем кнопки в исходное состояние
             self.upload_thread = None
             self.root.after(0, lambda: self.stop_button.config(state=tk.DISABLED))
@@ -2505,26 +5361,18 @@ class MikrotikUploaderGUI:
             
             def delete_scripts_thread():
                 try:
-                    uploader = MikrotikUploader()
-                    uploader.router_ip = self.selected_router.ip
-                    uploader.username = self.selected_router.username
-                    uploader.password = self.selected_router.password
-                    uploader.port = self.selected_router.port
-                    
-                    uploader.connect()
-                    if not uploader.login():
-                        raise Exception("Ошибка авторизации")
-                    
-                    success_count = 0
-                    for script_name in scripts_to_delete:
-                        self.log_message(f"🗑️ Удаление скрипта: {script_name}", "INFO")
-                        if uploader.remove_script(script_name):
-                            success_count += 1
-                            self.log_message(f"✅ Скрипт {script_name} удален", "INFO")
-                        else:
-                            self.log_message(f"❌ Ошибка удаления скрипта {script_name}", "ERROR")
-                    
-                    uploader.sock.close()
+                    deadline = Deadline(self.ACTION_BUDGET, phase="удаление скриптов")
+                    with self.session_pool.session(self.selected_router, deadline=deadline) as uploader:
+                        self.log_message(f"🗑️ Удаление скриптов: {', '.join(map(str, scripts_to_delete))}", "INFO")
+                        results = uploader.remove_scripts(scripts_to_delete)
+                        success_count = 0
+                        for script_name, removed in results.items():
+                            if removed:
+                                success_count += 1
+                                self.log_message(f"✅ Скрипт {script_name} удален", "INFO")
+                            else:
+                                self.log_message(f"❌ Ошибка удаления скрипта {script_name}", "ERROR")
+                        
                     self.log_message(f"🎉 Удаление завершено: {success_count}/{len(scripts_to_delete)}", "INFO")
                     
                     # Обновляем списки
@@ -2552,26 +5400,18 @@ class MikrotikUploaderGUI:
             
             def delete_schedulers_thread():
                 try:
-                    uploader = MikrotikUploader()
-                    uploader.router_ip = self.selected_router.ip
-                    uploader.username = self.selected_router.username
-                    uploader.password = self.selected_router.password
-                    uploader.port = self.selected_router.port
-                    
-                    uploader.connect()
-                    if not uploader.login():
-                        raise Exception("Ошибка авторизации")
-                    
-                    success_count = 0
-                    for scheduler_name in schedulers_to_delete:
-                        self.log_message(f"🗑️ Удаление шедулера: {scheduler_name}", "INFO")
-                        if uploader.remove_scheduler(scheduler_name):
-                            success_count += 1
-                            self.log_message(f"✅ Шедулер {scheduler_name} удален", "INFO")
-                        else:
-                            self.log_message(f"❌ Ошибка удаления шедулера {scheduler_name}", "ERROR")
-                    
-                    uploader.sock.close()
+                    deadline = Deadline(self.ACTION_BUDGET, phase="удаление шедулеров")
+                    with self.session_pool.session(self.selected_router, deadline=deadline) as uploader:
+                        self.log_message(f"🗑️ Удаление шедулеров: {', '.join(map(str, schedulers_to_delete))}", "INFO")
+                        results = uploader.remove_schedulers(schedulers_to_delete)
+                        success_count = 0
+                        for scheduler_name, removed in results.items():
+                            if removed:
+                                success_count += 1
+                                self.log_message(f"✅ Шедулер {scheduler_name} удален", "INFO")
+                            else:
+                                self.log_message(f"❌ Ошибка удаления шедулера {scheduler_name}", "ERROR")
+                        
                     self.log_message(f"🎉 Удаление завершено: {success_count}/{len(schedulers_to_delete)}", "INFO")
                     
                     # Обновляем списки
@@ -2596,47 +5436,19 @@ class MikrotikUploaderGUI:
         
         def enable_schedulers_thread():
             try:
-                uploader = MikrotikUploader()
-                uploader.router_ip = self.selected_router.ip
-                uploader.username = self.selected_router.username
-                uploader.password = self.selected_router.password
-                uploader.port = self.selected_router.port
-                
-                uploader.connect()
-                if not uploader.login():
-                    raise Exception("Ошибка авторизации")
-                
-                success_count = 0
-                for scheduler_name in schedulers_to_enable:
-                    self.log_message(f"▶️ Включение шедулера: {scheduler_name}", "INFO")
-                    
-                    # Получаем ID шедулера
-                    uploader.write_sentence(['/system/scheduler/print', f'?name={scheduler_name}'])
-                    scheduler_id = None
+                deadline = Deadline(self.ACTION_BUDGET, phase="включение шедулеров")
+                with self.session_pool.session(self.selected_router, deadline=deadline) as uploader:
+                    self.log_message(f"▶️ Включение шедулеров: {', '.join(map(str, schedulers_to_enable))}", "INFO")
+                    results = uploader.set_schedulers_disabled(schedulers_to_enable, disabled=False)
                     
-                    while True:
-                        reply = uploader.read_sentence()
-                        if not reply or reply[0] == '!done':
-                            break
-                        if reply[0] == '!re':
-                            for item in reply:
-                                if item.startswith('=.id='):
-                                    scheduler_id = item[5:]
-                                    break
-                    
-                    if scheduler_id:
-                        # Включаем шедулер (disabled=false)
-                        uploader.write_sentence(['/system/scheduler/set', f'=.id={scheduler_id}', '=disabled=false'])
-                        reply = uploader.read_sentence()
-                        if reply and reply[0] == '!done':
-                            success_count += 1
-                            self.log_message(f"✅ Шедулер {scheduler_name} включен", "INFO")
-                        else:
-                            self.log_message(f"❌ Ошибка включения шедулера {scheduler_name}", "ERROR")
+                success_count = 0
+                for scheduler_name, changed in results.items():
+                    if changed:
+                        success_count += 1
+                        self.log_message(f"✅ Шедулер {scheduler_name} включен", "INFO")
                     else:
-                        self.log_message(f"❌ Шедулер {scheduler_name} не найден", "ERROR")
-                
-                uploader.sock.close()
+                        self.log_message(f"❌ Ошибка включения шедулера {scheduler_name}", "ERROR")
+                    
                 self.log_message(f"🎉 Включение завершено: {success_count}/{len(schedulers_to_enable)}", "INFO")
                 
                 # Обновляем списки
@@ -2661,47 +5473,19 @@ class MikrotikUploaderGUI:
         
         def disable_schedulers_thread():
             try:
-                uploader = MikrotikUploader()
-                uploader.router_ip = self.selected_router.ip
-                uploader.username = self.selected_router.username
-                uploader.password = self.selected_router.password
-                uploader.port = self.selected_router.port
-                
-                uploader.connect()
-                if not uploader.login():
-                    raise Exception("Ошибка авторизации")
-                
-                success_count = 0
-                for scheduler_name in schedulers_to_disable:
-                    self.log_message(f"⏸️ Отключение шедулера: {scheduler_name}", "INFO")
-                    
-                    # Получаем ID шедулера
-                    uploader.write_sentence(['/system/scheduler/print', f'?name={scheduler_name}'])
-                    scheduler_id = None
+                deadline = Deadline(self.ACTION_BUDGET, phase="отключение шедулеров")
+                with self.session_pool.session(self.selected_router, deadline=deadline) as uploader:
+                    self.log_message(f"⏸️ Отключение шедулеров: {', '.join(map(str, schedulers_to_disable))}", "INFO")
+                    results = uploader.set_schedulers_disabled(schedulers_to_disable, disabled=True)
                     
-                    while True:
-                        reply = uploader.read_sentence()
-                        if not reply or reply[0] == '!done':
-                            break
-                        if reply[0] == '!re':
-                            for item in reply:
-                                if item.startswith('=.id='):
-                                    scheduler_id = item[5:]
-                                    break
-                    
-                    if scheduler_id:
-                        # Отключаем шедулер (disabled=true)
-                        uploader.write_sentence(['/system/scheduler/set', f'=.id={scheduler_id}', '=disabled=true'])
-                        reply = uploader.read_sentence()
-                        if reply and reply[0] == '!done':
-                            success_count += 1
-                            self.log_message(f"✅ Шедулер {scheduler_name} отключен", "INFO")
-                        else:
-                            self.log_message(f"❌ Ошибка отключения шедулера {scheduler_name}", "ERROR")
+                success_count = 0
+                for scheduler_name, changed in results.items():
+                    if changed:
+                        success_count += 1
+                        self.log_message(f"✅ Шедулер {scheduler_name} отключен", "INFO")
                     else:
-                        self.log_message(f"❌ Шедулер {scheduler_name} не найден", "ERROR")
-                
-                uploader.sock.close()
+                        self.log_message(f"❌ Ошибка отключения шедулера {scheduler_name}", "ERROR")
+                    
                 self.log_message(f"🎉 Отключение завершено: {success_count}/{len(schedulers_to_disable)}", "INFO")
                 
                 # Обновляем списки
@@ -2726,31 +5510,19 @@ class MikrotikUploaderGUI:
         
         def stop_jobs_thread():
             try:
-                uploader = MikrotikUploader()
-                uploader.router_ip = self.selected_router.ip
-                uploader.username = self.selected_router.username
-                uploader.password = self.selected_router.password
-                uploader.port = self.selected_router.port
-                
-                uploader.connect()
-                if not uploader.login():
-                    raise Exception("Ошибка авторизации")
-                
+                deadline = Deadline(self.ACTION_BUDGET, phase="остановка задач")
+                with self.session_pool.session(self.selected_router, deadline=deadline) as uploader:
+                    self.log_message(f"⏹️ Остановка задач ID: {', '.join(map(str, jobs_to_stop))}", "INFO")
+                    stopped = uploader.stop_jobs(jobs_to_stop)
+                    
                 success_count = 0
                 for job_id in jobs_to_stop:
-                    self.log_message(f"⏹️ Остановка задачи ID: {job_id}", "INFO")
-                    
-                    # Останавливаем задачу по ID
-                    uploader.write_sentence(['/system/script/job/stop', f'=.id={job_id}'])
-                    reply = uploader.read_sentence()
-                    
-                    if reply and reply[0] == '!done':
+                    if str(job_id) in stopped:
                         success_count += 1
                         self.log_message(f"✅ Задача {job_id} остановлена", "INFO")
                     else:
-                        self.log_message(f"❌ Ошибка остановки задачи {job_id}: {reply}", "ERROR")
-                
-                uploader.sock.close()
+                        self.log_message(f"❌ Ошибка остановки задачи {job_id}", "ERROR")
+                    
                 self.log_message(f"🎉 Остановка завершена: {success_count}/{len(jobs_to_stop)}", "INFO")
                 
                 # Обновляем списки задач
@@ -2765,52 +5537,17 @@ class MikrotikUploaderGUI:
         """Удаление завершенных задач"""
         def remove_jobs_thread():
             try:
-                uploader = MikrotikUploader()
-                uploader.router_ip = self.selected_router.ip
-                uploader.username = self.selected_router.username
-                uploader.password = self.selected_router.password
-                uploader.port = self.selected_router.port
-                
-                uploader.connect()
-                if not uploader.login():
-                    raise Exception("Ошибка авторизации")
-                
-                # Получаем список всех задач
-                uploader.write_sentence(['/system/script/job/print'])
-                finished_jobs = []
-                
-                while True:
-                    reply = uploader.read_sentence()
-                    if not reply or reply[0] == '!done':
-                        break
-                    if reply[0] == '!re':
-                        job_id = None
-                        job_status = None
-                        
-                        for item in reply:
-                            if item.startswith('=.id='):
-                                job_id = item[5:]
-                            elif item.startswith('=status='):
-                                job_status = item[8:]
-                        
-                        # Собираем завершенные задачи (статус != running)
-                        if job_id and job_status and job_status != 'running':
-                            finished_jobs.append(job_id)
-                
-                # Удаляем завершенные задачи
-                success_count = 0
-                for job_id in finished_jobs:
-                    self.log_message(f"🧹 Удаление завершенной задачи ID: {job_id}", "INFO")
-                    
-                    uploader.write_sentence(['/system/script/job/remove', f'=.id={job_id}'])
-                    reply = uploader.read_sentence()
+                deadline = Deadline(self.ACTION_BUDGET, phase="удаление задач")
+                with self.session_pool.session(self.selected_router, deadline=deadline) as uploader:
+                    finished_jobs, removed = uploader.remove_finished_jobs()
                     
-                    if reply and reply[0] == '!done':
-                        success_count += 1
+                success_count = len(removed)
+                for job_id in finished_jobs:
+                    if job_id in removed:
+                        self.log_message(f"🧹 Удалена завершенная задача ID: {job_id}", "INFO")
                     else:
-                        self.log_message(f"❌ Ошибка удаления задачи {job_id}: {reply}", "ERROR")
-                
-                uploader.sock.close()
+                        self.log_message(f"❌ Ошибка удаления задачи {job_id}", "ERROR")
+                    
                 self.log_message(f"🎉 Удаление завершено: {success_count}/{len(finished_jobs)} завершенных задач", "INFO")
                 
                 # Обновляем списки задач
@@ -2828,18 +5565,15 @@ class MikrotikUploaderGUI:
         
         def load_jobs_thread():
             try:
-                # Здесь будет код загрузки задач через API
-                # Пока заглушка
-                jobs = [
-                    {"id": "1", "script": "test-script", "status": "running", "duration": "00:05:30"},
-                    {"id": "2", "script": "backup-script", "status": "finished", "duration": "00:01:15"}
-                ]
+                deadline = Deadline(self.REFRESH_BUDGET, phase="список задач")
+                with self.session_pool.session(self.selected_router, deadline=deadline) as uploader:
+                    jobs = uploader.fetch_records('/system/script/job', JobRecord)
                 
                 def update_jobs_ui():
                     self.router_jobs_tree.delete(*self.router_jobs_tree.get_children())
                     for job in jobs:
                         self.router_jobs_tree.insert('', 'end', values=(
-                            job['id'], job['script'], job['status'], job['duration']
+                            job.id, job.script or job.type, job.status, job.started
                         ))
                 
                 self.root.after(0, update_jobs_ui)
@@ -2859,178 +5593,86 @@ class MikrotikUploaderGUI:
             self.upload_stop_flag.set()
             self.upload_thread.join(timeout=2)
         
-        # Сохраняем настройки
+        # Сохраняем настройки - единственная немедленная запись на диск
         self.save_settings()
+        try:
+            self.settings_store.flush()
+        except Exception as e:
+            print(f"Ошибка сохранения настроек: {e}")
+        
+        # Закрываем сессии с роутерами
+        self.session_pool.close_all()
         
         # Закрываем приложение
         self.root.destroy()
 
     def auto_load_router_content(self):
-        """Автоматическая загрузка содержимого роутера без диалогов."""
-        if not self.selected_router:
-            return
+        """Подробное обновление содержимого роутера без диалогов (через координатор)."""
+        self.request_refresh(verbose=True)
+    
+    def load_router_content_verbose(self, router):
+        """
+        Загрузка содержимого роутера с подробным журналом.
         
-        def auto_load_thread():
-            try:
-                self.log_message("🔗 Начинаем автообновление содержимого роутера", "INFO")
-                
-                uploader = MikrotikUploader()
-                uploader.router_ip = self.selected_router.ip
-                uploader.username = self.selected_router.username
-                uploader.password = self.selected_router.password
-                uploader.port = self.selected_router.port
-                
-                # Подключаемся и авторизуемся
-                self.log_message(f"📡 Подключение к {self.selected_router.ip}:{self.selected_router.port}", "INFO")
-                uploader.connect()
-                
-                # Устанавливаем разумный таймаут - 3 секунды
-                uploader.sock.settimeout(3.0)
-                self.log_message("⏱️ Установлен таймаут соединения: 3 сек", "INFO")
-                
-                self.log_message(f"🔐 Авторизация пользователя: {self.selected_router.username}", "INFO")
-                if not uploader.login():
-                    raise Exception("Ошибка авторизации")
-                self.log_message("✅ Авторизация успешна", "INFO")
+        Returns:
+            bool: True если списки получены
+        """
+        try:
+            self.log_message("🔗 Начинаем автообновление содержимого роутера", "INFO")
+            
+            # Берем авторизованную сессию из пула (подключение и вход - только при необходимости)
+            self.log_message(f"📡 Сессия с {router.ip}:{router.port} (бюджет {self.REFRESH_BUDGET:g} сек)", "INFO")
+            deadline = Deadline(self.REFRESH_BUDGET, phase="обновление содержимого")
+            with self.session_pool.session(router, deadline=deadline) as uploader:
+                self.log_message("✅ Сессия готова", "INFO")
                 
                 # Получаем скрипты БЕЗ source поля (избегаем пагинацию)
                 self.log_message("📜 Запрос списка скриптов БЕЗ source: /system/script/print .proplist", "INFO")
-                uploader.write_sentence(['/system/script/print', '=.proplist=.id,name,owner,run-count'])
                 scripts = []
-                scripts_count = 0
-                
-                while True:
-                    try:
-                        reply = uploader.read_sentence()
-                        if not reply:
-                            self.log_message("⚠️ Получен пустой ответ", "INFO")
-                            break
-                            
-                        if reply[0] == '!done':
-                            # Получили завершающий маркер - все данные прочитаны
-                            self.log_message("✅ Получен маркер завершения !done", "INFO")
-                            break
-                        elif reply[0] == '!re':
-                            # Обрабатываем каждый скрипт БЕЗ source поля
-                            script_info = {'name': '', 'owner': '', 'run-count': '0'}
-                            for item in reply[1:]:  # Пропускаем !re
-                                if item.startswith('=name='):
-                                    script_info['name'] = item[6:]
-                                elif item.startswith('=owner='):
-                                    script_info['owner'] = item[7:]
-                                elif item.startswith('=run-count='):
-                                    script_info['run-count'] = item[12:]
-                            
-                            if script_info['name']:
-                                scripts.append(script_info)
-                                scripts_count += 1
-                                run_count = script_info.get('run-count', '0')
-                                self.log_message(f"📋 Скрипт {scripts_count}: {script_info['name']} (владелец: {script_info['owner']}, запусков: {run_count})", "INFO")
-                        elif reply[0] == '!trap':
-                            # Ошибка API - выходим
-                            self.log_message(f"❌ API Error: {reply}", "ERROR")
-                            break
-                            
-                    except Exception as e:
-                        # Таймаут или другая ошибка - завершаем чтение
-                        if scripts_count > 0:
-                            # Если хоть что-то прочитали - это нормально
-                            self.log_message(f"⏱️ Таймаут чтения, получено {scripts_count} скриптов", "INFO")
-                            break
-                        else:
-                            raise e
+                for script in uploader.iter_records('/system/script', ScriptRecord):
+                    if script.name:
+                        scripts.append(script)
+                        self.log_message(f"📋 Скрипт {len(scripts)}: {script.name} (владелец: {script.owner}, запусков: {script.run_count})", "INFO")
+                self.log_message("✅ Получен маркер завершения !done", "INFO")
                 
                 # Получаем шедулеры аналогично
-                self.log_message("⏰ Запрос списка шедулеров: /system/scheduler/print", "INFO")
-                uploader.write_sentence(['/system/scheduler/print'])
+                self.log_message("⏰ Запрос списка шедулеров: /system/scheduler/print .proplist", "INFO")
                 schedulers = []
-                schedulers_count = 0
-                
-                while True:
-                    try:
-                        reply = uploader.read_sentence()
-                        if not reply:
-                            self.log_message("⚠️ Получен пустой ответ шедулеров", "INFO")
-                            break
-                            
-                        if reply[0] == '!done':
-                            self.log_message("✅ Получен маркер завершения шедулеров !done", "INFO")
-                            break
-                        elif reply[0] == '!re':
-                            scheduler_info = {'name': '', 'disabled': 'true', 'next-run': ''}
-                            for item in reply[1:]:
-                                if item.startswith('=name='):
-                                    scheduler_info['name'] = item[6:]
-                                elif item.startswith('=disabled='):
-                                    scheduler_info['disabled'] = item[10:]
-                                elif item.startswith('=next-run='):
-                                    scheduler_info['next-run'] = item[11:]
-                            
-                            if scheduler_info['name']:
-                                schedulers.append(scheduler_info)
-                                schedulers_count += 1
-                                status = "активен" if scheduler_info['disabled'] == 'false' else "отключен"
-                                self.log_message(f"⏰ Шедулер {schedulers_count}: {scheduler_info['name']} ({status})", "INFO")
-                        elif reply[0] == '!trap':
-                            self.log_message(f"❌ Scheduler API Error: {reply}", "ERROR")
-                            break
-                            
-                    except Exception as e:
-                        if schedulers_count > 0:
-                            self.log_message(f"⏱️ Таймаут чтения шедулеров, получено {schedulers_count}", "INFO")
-                            break
-                        else:
-                            raise e
-                
-                # Закрываем соединение
-                self.log_message("🔌 Закрытие соединения с роутером", "INFO")
-                uploader.sock.close()
-                
-                self.log_message(f"🎯 Автообновление завершено: {len(scripts)} скриптов, {len(schedulers)} шедулеров", "INFO")
-                
-                def update_ui():
-                    # Очищаем и обновляем скрипты в router_scripts_tree
-                    self.router_scripts_tree.delete(*self.router_scripts_tree.get_children())
-                    for script in scripts:
-                        run_count = script.get('run-count', '0')
-                        self.router_scripts_tree.insert('', 'end', values=(script['name'], run_count))
-                    
-                    # Очищаем и обновляем шедулеры в router_schedulers_tree
-                    self.router_schedulers_tree.delete(*self.router_schedulers_tree.get_children())
-                    for scheduler in schedulers:
-                        status = "✓" if scheduler.get('disabled') == 'false' else "✗"
-                        next_run = scheduler.get('next-run', 'никогда')
-                        self.router_schedulers_tree.insert('', 'end', values=(scheduler['name'], status, next_run))
-                    
-                    # Обновляем список файлов на роутере
-                    if hasattr(self, 'remote_scripts_tree'):
-                        self.remote_scripts_tree.delete(*self.remote_scripts_tree.get_children())
-                        for script in scripts:
-                            run_count = script.get('run-count', '0')
-                            self.remote_scripts_tree.insert('', 'end', values=(script['name'], run_count))
-                        
-                        # Обновляем статус с отладочной информацией
-                        self.remote_status_var.set(f"Скриптов: {len(scripts)}, Шедулеров: {len(schedulers)}")
-                        # Обновляем также статус вкладки "Содержимое"
-                        self.content_status_var.set(f"Скриптов: {len(scripts)}, Шедулеров: {len(schedulers)}")
-                
-                # Обновляем UI в основном потоке
-                self.root.after(0, update_ui)
-                
-            except Exception as e:
-                self.log_message(f"Автообновление содержимого: {e}", "WARNING")
-                
-                def update_error_status():
-                    if hasattr(self, 'remote_status_var'):
-                        self.remote_status_var.set("Ошибка подключения")
-                    if hasattr(self, 'content_status_var'):
-                        self.content_status_var.set("Ошибка подключения")
+                for scheduler in uploader.iter_records('/system/scheduler', SchedulerRecord):
+                    if scheduler.name:
+                        schedulers.append(scheduler)
+                        status = "активен" if scheduler.enabled else "отключен"
+                        self.log_message(f"⏰ Шедулер {len(schedulers)}: {scheduler.name} ({status})", "INFO")
+                self.log_message("✅ Получен маркер завершения шедулеров !done", "INFO")
+            
+            self.log_message(f"🎯 Автообновление завершено: {len(scripts)} скриптов, {len(schedulers)} шедулеров", "INFO")
+            
+            def update_ui():
+                # Пока шло обновление, мог быть выбран другой роутер
+                if router is not self.selected_router:
+                    return
                 
-                # Обновляем статус ошибки в UI потоке
-                self.root.after(0, update_error_status)
-        
-        # Запускаем в отдельном потоке
-        threading.Thread(target=auto_load_thread, daemon=True).start()
+                # Обновляем только изменившиеся строки списков
+                self.show_router_content(scripts, schedulers)
+            
+            # Обновляем UI в основном потоке
+            self.root.after(0, update_ui)
+            return True
+            
+        except Exception as e:
+            self.log_message(f"Автообновление содержимого: {e}", "WARNING")
+            
+            def update_error_status():
+                if router is not self.selected_router:
+                    return
+                if hasattr(self, 'remote_status_var'):
+                    self.remote_status_var.set("Ошибка подключения")
+                if hasattr(self, 'content_status_var'):
+                    self.content_status_var.set("Ошибка подключения")
+            
+            # Обновляем статус ошибки в UI потоке
+            self.root.after(0, update_error_status)
+            return False
 
     def clear_log(self):
         """Очистка лога."""
@@ -3038,6 +5680,12 @@ class MikrotikUploaderGUI:
         self.log_text.delete(1.0, tk.END)
         self.log_text.config(state=tk.DISABLED)
 
+    def on_changed_only_change(self):
+        """Обработчик переключения режима "только измененные"."""
+        self.upload_changed_only = self.changed_only_var.get()
+        mode_text = "только измененные" if self.upload_changed_only else "все выбранные"
+        self.log_message(f"Режим загрузки: {mode_text}", "INFO")
+    
     def on_log_mode_change(self):
         """Обработчик изменения режима лога."""
         self.log_mode = self.log_mode_var.get()